@@ -14,15 +14,66 @@ REPORTING_DB_PATH = 'database/reporting.db'
 DEFAULT_ADMIN_USERNAME = "admin"
 DEFAULT_ADMIN_PASSWORD = "admin"
 
-def init_db():
-    # Check if database file exists and remove it to start fresh
+# Bump whenever the init_db schema script changes so existing databases are migrated
+SCHEMA_VERSION = 3
+
+# Connection tuning applied to every database handle; open_db callers can override entries
+CONNECTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+
+# The report connection only runs analytic scans, so it gets a larger page cache
+# to keep the denormalized table's indexes resident between reports
+REPORTING_CONNECTION_PRAGMAS = {
+    "cache_size": -65536,
+}
+
+# Columns selected as "name [BOOLEAN]" arrive as Python bools
+sqlite3.register_converter("BOOLEAN", lambda value: value == b"1")
+
+def open_db(path, pragmas=None):
+    """
+    Open a database connection in autocommit mode with the tuned PRAGMAs applied
     
-    # Connect to database (this will create the file if it doesn't exist)
-    conn = sqlite3.connect(DB_PATH)
+    Args:
+        path: Path to the SQLite database
+        pragmas: Optional mapping of PRAGMA names to values overriding CONNECTION_PRAGMAS
+    """
+    conn = sqlite3.connect(
+        path,
+        isolation_level=None,
+        cached_statements=256,
+        detect_types=sqlite3.PARSE_COLNAMES
+    )
+    settings = {**CONNECTION_PRAGMAS, **(pragmas or {})}
+    conn.executescript("".join(f"PRAGMA {name}={value};" for name, value in settings.items()))
+    return conn
+
+def init_db(conn=None):
+    # Connect to database (this will create the file if it doesn't exist),
+    # unless the caller already holds a connection
+    owns_connection = conn is None
+    if owns_connection:
+        conn = open_db(DB_PATH)
     cursor = conn.cursor()
     
-    # Create tables
+    # Nothing to do if the schema is already at the current version
+    cursor.execute("PRAGMA user_version")
+    if cursor.fetchone()[0] >= SCHEMA_VERSION:
+        if owns_connection:
+            conn.close()
+        return
+    
+    # Create tables, indexes and the version stamp in a single transaction
     cursor.executescript('''
+    BEGIN;
+    
     -- Users table
     CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -37,6 +88,7 @@ def init_db():
     CREATE TABLE IF NOT EXISTS categories (
         category_id INTEGER PRIMARY KEY AUTOINCREMENT,
         category_name TEXT UNIQUE NOT NULL,
+        user_id INTEGER NOT NULL,
         is_deleted BOOLEAN NOT NULL DEFAULT 0,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -67,21 +119,40 @@ def init_db():
         FOREIGN KEY (category_id) REFERENCES categories(category_id),
         FOREIGN KEY (payment_method_id) REFERENCES payment_methods(payment_method_id)                      
     );
-    ''')
     
+    -- Indexes for the reporting sync filter and the foreign key joins
+    CREATE INDEX IF NOT EXISTS idx_expenses_updated ON expenses(updated_at, is_deleted);
+    -- A user's live expenses in date order; also serves plain user_id lookups
+    DROP INDEX IF EXISTS idx_expenses_user;
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_deleted_date ON expenses(user_id, is_deleted, expense_date);
+    CREATE INDEX IF NOT EXISTS idx_expenses_cat ON expenses(category_id);
+    CREATE INDEX IF NOT EXISTS idx_expenses_pm ON expenses(payment_method_id);
+    CREATE INDEX IF NOT EXISTS idx_categories_user ON categories(user_id);
+    -- Name to id lookups answered from the index alone
+    CREATE INDEX IF NOT EXISTS idx_categories_name_lookup ON categories(category_name, is_deleted, category_id);
+    CREATE INDEX IF NOT EXISTS idx_payment_methods_name_lookup ON payment_methods(name, is_deleted, payment_method_id);
+    
+    ANALYZE;
+    ''')
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     
     conn.commit()
-    conn.close()
+    if owns_connection:
+        conn.close()
     
     print(f"Database initialized successfully at {DB_PATH}")
 
-def init_reporting_db():
+def init_reporting_db(conn=None):
     """Initialize the reporting database with denormalized schema for analytics"""
-    conn = sqlite3.connect(REPORTING_DB_PATH)
+    owns_connection = conn is None
+    if owns_connection:
+        conn = open_db(REPORTING_DB_PATH)
     cursor = conn.cursor()
     
-    # Create a denormalized expenses table
+    # Create a denormalized expenses table and seed the metadata in a single transaction
     cursor.executescript('''
+    BEGIN;
+    
     -- Denormalized expenses table for reporting
     CREATE TABLE IF NOT EXISTS denormalized_expenses (
         expense_id INTEGER PRIMARY KEY,
@@ -96,6 +167,10 @@ def init_reporting_db():
         updated_at TIMESTAMP NOT NULL
     );
     
+    -- Covering indexes for the reports' date range filters and their SUM/AVG over amount
+    CREATE INDEX IF NOT EXISTS idx_denormalized_expenses_date ON denormalized_expenses(expense_date, amount);
+    CREATE INDEX IF NOT EXISTS idx_denormalized_expenses_category_date ON denormalized_expenses(category_name, expense_date, amount);
+    
     -- Table to track last update time
     CREATE TABLE IF NOT EXISTS sync_metadata (
         id INTEGER PRIMARY KEY CHECK (id = 1),
@@ -103,141 +178,121 @@ def init_reporting_db():
     );
     ''')
     
-    # Initialize last_sync_time if it doesn't exist
-    cursor.execute("SELECT COUNT(*) FROM sync_metadata")
-    if cursor.fetchone()[0] == 0:
-        # Initialize with a timestamp far in the past to ensure all records are included on first sync
-        cursor.execute('''
-        INSERT INTO sync_metadata (id, last_sync_time) VALUES (1, '1970-01-01 00:00:00')
-        ''')
+    # Initialize last_sync_time if it doesn't exist, with a timestamp far in the past
+    # to ensure all records are included on first sync
+    cursor.execute('''
+    INSERT OR IGNORE INTO sync_metadata (id, last_sync_time) VALUES (1, '1970-01-01 00:00:00')
+    ''')
     
     conn.commit()
-    conn.close()
+    if owns_connection:
+        conn.close()
     
     print(f"Reporting database initialized successfully at {REPORTING_DB_PATH}")
 
 def update_reporting_db():
     """Update the reporting database with new/changed records from the main database"""
-    # Connect to both databases
-    main_conn = sqlite3.connect(DB_PATH)
-    main_conn.row_factory = sqlite3.Row  # This allows accessing columns by name
-    main_cursor = main_conn.cursor()
-    
-    reporting_conn = sqlite3.connect(REPORTING_DB_PATH)
+    # Connect to the reporting database and attach the main database to it
+    reporting_conn = open_db(REPORTING_DB_PATH)
     reporting_cursor = reporting_conn.cursor()
+    reporting_cursor.execute("ATTACH DATABASE ? AS appdb", (DB_PATH,))
     
-    # Get the last sync time
-    reporting_cursor.execute("SELECT last_sync_time FROM sync_metadata WHERE id = 1")
-    last_sync_time = reporting_cursor.fetchone()[0]
-    
-    # Current time to use as new last_sync_time
+    # Current time for the status message
     current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Query expenses updated since last sync
-    main_cursor.execute('''
-    SELECT 
-        e.expense_id, 
-        u.username,
-        c.category_name,
-        pm.name as payment_method_name,
-        e.amount,
-        e.expense_date,
-        e.description,
-        e.tag,
-        e.created_at,
-        e.updated_at
-    FROM expenses e
-    JOIN users u ON e.user_id = u.user_id
-    JOIN categories c ON e.category_id = c.category_id
-    JOIN payment_methods pm ON e.payment_method_id = pm.payment_method_id
-    WHERE e.updated_at > ? AND e.is_deleted = 0
-    ''', (last_sync_time,))
-    
-    updated_expenses = main_cursor.fetchall()
-    
-    # Update the reporting database
-    for expense in updated_expenses:
-        # Check if this expense already exists in the reporting database
+    # Run the whole sync as one transaction. It is deferred because BEGIN IMMEDIATE
+    # would also take the write lock on the attached app.db, which is only read;
+    # the first write to denormalized_expenses locks the reporting database
+    reporting_cursor.execute("BEGIN")
+    try:
+        # Get the last sync time together with the newest change in the main database,
+        # which becomes the next last sync time so rows stamped behind the wall clock
+        # are never skipped. Rows stamped in the same second as the last sync are
+        # replayed, which the upsert makes harmless
         reporting_cursor.execute('''
-        SELECT COUNT(*) FROM denormalized_expenses WHERE expense_id = ?
-        ''', (expense['expense_id'],))
+        SELECT
+            last_sync_time,
+            COALESCE(
+                (SELECT MAX(updated_at) FROM appdb.expenses WHERE updated_at > last_sync_time),
+                last_sync_time
+            )
+        FROM sync_metadata WHERE id = 1
+        ''')
+        last_sync_time, new_sync_time = reporting_cursor.fetchone()
         
-        if reporting_cursor.fetchone()[0] > 0:
-            # Update existing record
-            reporting_cursor.execute('''
-            UPDATE denormalized_expenses SET
-                username = ?,
-                category_name = ?,
-                payment_method_name = ?,
-                amount = ?,
-                expense_date = ?,
-                description = ?,
-                tag = ?,
-                created_at = ?,
-                updated_at = ?
-            WHERE expense_id = ?
-            ''', (
-                expense['username'],
-                expense['category_name'],
-                expense['payment_method_name'],
-                expense['amount'],
-                expense['expense_date'],
-                expense['description'],
-                expense['tag'],
-                expense['created_at'],
-                expense['updated_at'],
-                expense['expense_id']
-            ))
-        else:
-            # Insert new record
-            reporting_cursor.execute('''
-            INSERT INTO denormalized_expenses (
-                expense_id, username, category_name, payment_method_name,
-                amount, expense_date, description, tag, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                expense['expense_id'],
-                expense['username'],
-                expense['category_name'],
-                expense['payment_method_name'],
-                expense['amount'],
-                expense['expense_date'],
-                expense['description'],
-                expense['tag'],
-                expense['created_at'],
-                expense['updated_at']
-            ))
-    
-    # Handle deleted expenses in main database
-    main_cursor.execute('''
-    SELECT expense_id FROM expenses 
-    WHERE updated_at > ? AND is_deleted = 1
-    ''', (last_sync_time,))
-    
-    deleted_expense_ids = [row[0] for row in main_cursor.fetchall()]
-    
-    # Delete these expenses from the reporting database
-    if deleted_expense_ids:
-        placeholders = ','.join(['?'] * len(deleted_expense_ids))
-        reporting_cursor.execute(f'''
+        # Copy expenses updated since last sync, overwriting existing records
+        reporting_cursor.execute('''
+        INSERT INTO denormalized_expenses (
+            expense_id, username, category_name, payment_method_name,
+            amount, expense_date, description, tag, created_at, updated_at
+        )
+        SELECT 
+            e.expense_id, 
+            u.username,
+            c.category_name,
+            pm.name,
+            e.amount,
+            e.expense_date,
+            e.description,
+            e.tag,
+            e.created_at,
+            e.updated_at
+        FROM appdb.expenses e
+        JOIN appdb.users u ON e.user_id = u.user_id
+        JOIN appdb.categories c ON e.category_id = c.category_id
+        JOIN appdb.payment_methods pm ON e.payment_method_id = pm.payment_method_id
+        WHERE e.updated_at >= ? AND e.updated_at <= ? AND e.is_deleted = 0
+        ON CONFLICT(expense_id) DO UPDATE SET
+            username = excluded.username,
+            category_name = excluded.category_name,
+            payment_method_name = excluded.payment_method_name,
+            amount = excluded.amount,
+            expense_date = excluded.expense_date,
+            description = excluded.description,
+            tag = excluded.tag,
+            created_at = excluded.created_at,
+            updated_at = excluded.updated_at
+        ''', (last_sync_time, new_sync_time))
+        
+        # Delete expenses removed from the main database since last sync
+        reporting_cursor.execute('''
         DELETE FROM denormalized_expenses 
-        WHERE expense_id IN ({placeholders})
-        ''', deleted_expense_ids)
-    
-    # Update the last sync time
-    reporting_cursor.execute('''
-    UPDATE sync_metadata SET last_sync_time = ? WHERE id = 1
-    ''', (current_time,))
-    
-    # Commit changes and close connections
-    reporting_conn.commit()
-    reporting_conn.close()
-    main_conn.close()
+        WHERE expense_id IN (
+            SELECT expense_id FROM appdb.expenses 
+            WHERE updated_at >= ? AND updated_at <= ? AND is_deleted = 1
+        )
+        ''', (last_sync_time, new_sync_time))
+        
+        # Update the last sync time
+        reporting_cursor.execute('''
+        UPDATE sync_metadata SET last_sync_time = ? WHERE id = 1
+        ''', (new_sync_time,))
+        
+        reporting_cursor.execute("COMMIT")
+    except Exception:
+        reporting_cursor.execute("ROLLBACK")
+        raise
+    finally:
+        # Close the connection
+        reporting_cursor.execute("DETACH DATABASE appdb")
+        reporting_conn.close()
     
     print(f"Reporting database updated successfully at {current_time}")
 
 
+def reset_db():
+    """Delete both database files so the next initialization starts from scratch"""
+    for path in (DB_PATH, REPORTING_DB_PATH):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    print("Databases removed")
+
+
 if __name__ == "__main__":
+    if "--reset" in sys.argv[1:]:
+        reset_db()
     init_db()
     init_reporting_db()
     update_reporting_db()
\ No newline at end of file
@@ -1,6 +1,5 @@
-import sqlite3
 import os
-from database.init_db import init_db, update_reporting_db, init_reporting_db  # Import the init_db function
+from database.init_db import init_db, update_reporting_db, init_reporting_db, open_db, REPORTING_CONNECTION_PRAGMAS  # Import the init_db function
 from src.auth.auth_integration import ExpenseAuthIntegration
 from src.parser.parser import Parser, ParserError
 from src.commands.commands import CommandHandler
@@ -10,14 +9,14 @@ DB_PATH = os.path.join(os.path.dirname(__file__), "database", "app.db")
 REPORTING_DB_PATH =  os.path.join(os.path.dirname(__file__), "database", "reporting.db")
 
 def main():
-    # Initialize the database
-    init_db()
-    init_reporting_db()
-    # Connect to the database
-    db_connection = sqlite3.connect(DB_PATH)
-    reporting_db_connection = sqlite3.connect(REPORTING_DB_PATH)
-    # Initialize authentication system
-    auth = ExpenseAuthIntegration(db_path=DB_PATH)
+    # Connect to the databases
+    db_connection = open_db(DB_PATH)
+    reporting_db_connection = open_db(REPORTING_DB_PATH, pragmas=REPORTING_CONNECTION_PRAGMAS)
+    # Bring the schemas up to date on the same connections
+    init_db(db_connection)
+    init_reporting_db(reporting_db_connection)
+    # Initialize authentication system on the shared connection
+    auth = ExpenseAuthIntegration(db_path=DB_PATH, connection=db_connection)
     
     # Initialize command handler
     command_handler = CommandHandler(db_connection=db_connection, reporting_db_connection=reporting_db_connection, auth=auth)
@@ -34,6 +33,9 @@ def main():
             user_input = input("Enter command: ").strip()
             if user_input.lower() in ["exit", "quit"]:
                 print("Exiting the application. Goodbye!")
+                # Keep the changes of a batch that was never committed
+                if db_connection.in_transaction:
+                    db_connection.commit()
                 try: 
                     update_reporting_db()
                 except Exception as e:
@@ -59,12 +61,7 @@ def main():
             
             # Handle authentication-related commands
             if command in ["login", "logout"]:
-                if command == "login":
-                    success, message = auth.login(*args)
-                    print(message)
-                elif command == "logout":
-                    success, message = auth.logout()
-                    print(message)
+                print(command_handler.execute_command(command, args))
                 continue
             
             # Ensure user is logged in for other commands
@@ -72,9 +69,9 @@ def main():
                 print("You must be logged in to execute this command.")
                 continue
             
-            # Execute the command using CommandHandler
-            if command in command_handler.command_map:
-                result = command_handler.command_map[command](args)
+            # Execute the command using CommandHandler, which enforces admin-only commands
+            if command in command_handler.command_set:
+                result = command_handler.execute_command(command, args)
                 print(result)
             else:
                 print(f"Unknown command: {command}")
@@ -85,12 +82,13 @@ def main():
             print(f"Command Error: {e}")
         except Exception as e:
             print(f"Unexpected Error: {e}")
-        finally:
-            # Commit changes to the database
-            db_connection.commit()
     
-    # Close the database connection
+    # Refresh planner statistics and close the database connections
+    db_connection.execute("PRAGMA optimize")
     db_connection.close()
+    reporting_db_connection.execute("PRAGMA optimize")
+    reporting_db_connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    reporting_db_connection.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,39 +1,104 @@
+import os
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 from base64 import b64encode, b64decode
 from cryptography.hazmat.primitives.asymmetric.types import PublicKeyTypes, PrivateKeyTypes
 
+# Prefix marking messages sealed with AES-GCM; anything else is legacy RSA-OAEP
+AESGCM_PREFIX = "aesgcm$"
+NONCE_SIZE = 12
+
+# Prefix of the PHC strings produced by the Argon2id password hasher
+ARGON2_PREFIX = "$argon2"
+
+# Argon2id with the RFC 9106 low-memory profile. Parallelism is fixed rather than
+# tied to os.cpu_count() so hashes never look outdated when moved between machines
+password_hasher = PasswordHasher(time_cost=3, memory_cost=64 * 1024, parallelism=4)
+
+# Parsed keys are shared by every UserAuth instance so the PEM files are only read once
+@lru_cache(maxsize=1)
+def _load_public_key() -> PublicKeyTypes:
+    with open("keys/public_key.pem", "rb") as key_file:
+        public_key = serialization.load_pem_public_key(key_file.read())
+    return public_key
+
+@lru_cache(maxsize=1)
+def _load_private_key() -> PrivateKeyTypes:
+    with open("keys/private_key.pem", "rb") as key_file:
+        private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+    return private_key
+
+@lru_cache(maxsize=1)
+def _load_key_pair() -> tuple[PublicKeyTypes, PrivateKeyTypes]:
+    # Read and parse both PEM files side by side on first use; the private key
+    # parse dominates, so the public key no longer adds to startup latency
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        public_future = executor.submit(_load_public_key)
+        private_future = executor.submit(_load_private_key)
+        return public_future.result(), private_future.result()
+
+@lru_cache(maxsize=1)
+def _derive_symmetric_key() -> bytes:
+    # Derive the AES key from the private key so no extra key file needs to be managed
+    private_bytes = _load_private_key().private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"expense-share user auth"
+    ).derive(private_bytes)
 
 
 class UserAuth():
-    def __init__(self) -> None:
-        self.public_key = self.load_public_key()
-        self.private_key = self.load_private_key()
+    # Keys are only needed to read messages and legacy passwords, so they are
+    # resolved on first use rather than whenever a UserAuth is constructed
+    @cached_property
+    def public_key(self) -> PublicKeyTypes:
+        return _load_key_pair()[0]
+
+    @cached_property
+    def private_key(self) -> PrivateKeyTypes:
+        return _load_key_pair()[1]
+
+    @cached_property
+    def aesgcm(self) -> AESGCM:
+        return AESGCM(_derive_symmetric_key())
 
     def load_public_key(self) -> PublicKeyTypes:
-        with open("keys/public_key.pem", "rb") as key_file:
-            public_key = serialization.load_pem_public_key(key_file.read())
-        return public_key
+        return _load_public_key()
 
     def load_private_key(self) -> PrivateKeyTypes:
-        with open("keys/private_key.pem", "rb") as key_file:
-            private_key = serialization.load_pem_private_key(key_file.read(), password=None)
-        return private_key
+        return _load_private_key()
 
     def encode(self, message: str) -> str:
-        encrypted = self.public_key.encrypt(
-            message.encode(),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
-        return b64encode(encrypted).decode()
+        nonce = os.urandom(NONCE_SIZE)
+        encrypted = self.aesgcm.encrypt(nonce, message.encode(), None)
+        return AESGCM_PREFIX + b64encode(nonce + encrypted).decode()
 
     def decode(self, encrypted_message: str) -> str:
+        if not encrypted_message.startswith(AESGCM_PREFIX):
+            return self.decode_rsa(encrypted_message)
+        sealed = b64decode(encrypted_message[len(AESGCM_PREFIX):])
+        decrypted = self.aesgcm.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], None)
+        return decrypted.decode()
+
+    def decode_rsa(self, encrypted_message: str) -> str:
+        """Decrypt a message produced by the previous RSA-OAEP encode"""
         decrypted = self.private_key.decrypt(
             b64decode(encrypted_message),
             padding.OAEP(
@@ -45,3 +110,25 @@ class UserAuth():
         return decrypted.decode()
 
    
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password with Argon2id"""
+        return password_hasher.hash(password)
+
+    def verify_password(self, password_hash: str, password: str) -> bool:
+        """Check a password against an Argon2id hash or a legacy encrypted password"""
+        if not password_hash.startswith(ARGON2_PREFIX):
+            try:
+                return hmac.compare_digest(self.decode(password_hash).encode(), password.encode())
+            except Exception:
+                return False
+        try:
+            return password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether a stored password should be rehashed with the current parameters"""
+        if not password_hash.startswith(ARGON2_PREFIX):
+            return True
+        return password_hasher.check_needs_rehash(password_hash)
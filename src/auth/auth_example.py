@@ -35,92 +35,96 @@ def main():
     # Initialize the authentication system
     auth_manager = UserAuthentication(db_path="database/app.db")
     
-    # Example: Register a new user
-    print("Registering new user...")
-    user_id = auth_manager.register_user(
-        username="johndoe", 
-        password="securePassword123", 
-        is_admin=False
-    )
+    # Run the whole walkthrough as one transaction so it commits once
+    with auth_manager.transaction():
+        # Example: Register a new user
+        print("Registering new user...")
+        user_id = auth_manager.register_user(
+            username="johndoe", 
+            password="securePassword123", 
+            is_admin=False
+        )
     
-    if user_id:
-        print(f"User registered successfully with ID: {user_id}")
-    else:
-        print("Username already exists")
+        if user_id:
+            print(f"User registered successfully with ID: {user_id}")
+        else:
+            print("Username already exists")
     
-    # Example: Register an admin user
-    print("\nRegistering admin user...")
-    admin_id = auth_manager.register_user(
-        username="adminuser", 
-        password="adminPass456", 
-        is_admin=True
-    )
+        # Example: Register an admin user
+        print("\nRegistering admin user...")
+        admin_id = auth_manager.register_user(
+            username="adminuser", 
+            password="adminPass456", 
+            is_admin=True
+        )
     
-    if admin_id:
-        print(f"Admin user registered successfully with ID: {admin_id}")
-    else:
-        print("Username already exists")
+        if admin_id:
+            print(f"Admin user registered successfully with ID: {admin_id}")
+        else:
+            print("Username already exists")
     
-    # Example: Verify user credentials
-    print("\nVerifying regular user credentials...")
-    user_data = auth_manager.verify_user("johndoe", "securePassword123")
+        # Example: Verify user credentials
+        print("\nVerifying regular user credentials...")
+        user_data = auth_manager.verify_user("johndoe", "securePassword123")
     
-    if user_data:
-        print("User authenticated successfully!")
-        print(f"User data: {user_data}")
-        print(f"Is admin: {user_data['is_admin']}")
-    else:
-        print("Invalid username or password")
+        if user_data:
+            print("User authenticated successfully!")
+            print(f"User data: {user_data}")
+            print(f"Is admin: {user_data['is_admin']}")
+        else:
+            print("Invalid username or password")
     
-    # Example: Verify admin credentials
-    print("\nVerifying admin user credentials...")
-    admin_data = auth_manager.verify_user("adminuser", "adminPass456")
+        # Example: Verify admin credentials
+        print("\nVerifying admin user credentials...")
+        admin_data = auth_manager.verify_user("adminuser", "adminPass456")
     
-    if admin_data:
-        print("Admin authenticated successfully!")
-        print(f"Admin data: {admin_data}")
-        print(f"Is admin: {admin_data['is_admin']}")
-    else:
-        print("Invalid username or password")
+        if admin_data:
+            print("Admin authenticated successfully!")
+            print(f"Admin data: {admin_data}")
+            print(f"Is admin: {admin_data['is_admin']}")
+        else:
+            print("Invalid username or password")
     
-    # Example: Update user password
-    print("\nUpdating user password...")
-    if user_id and auth_manager.update_password(user_id, "newSecurePassword456"):
-        print("Password updated successfully")
+        # Example: Update user password
+        print("\nUpdating user password...")
+        if user_id and auth_manager.update_password(user_id, "newSecurePassword456"):
+            print("Password updated successfully")
         
-        # Verify with the new password
-        print("\nVerifying with new password...")
-        user_data = auth_manager.verify_user("johndoe", "newSecurePassword456")
+            # Verify with the new password
+            print("\nVerifying with new password...")
+            user_data = auth_manager.verify_user("johndoe", "newSecurePassword456")
         
-        if user_data:
-            print("User authenticated successfully with new password!")
+            if user_data:
+                print("User authenticated successfully with new password!")
+            else:
+                print("Authentication failed with new password")
         else:
-            print("Authentication failed with new password")
-    else:
-        print("Failed to update password")
+            print("Failed to update password")
     
-    # Example: Set admin status for a regular user
-    print("\nChanging user to admin...")
-    if auth_manager.set_admin_status(user_id, True):
-        print("User is now an admin")
-        user_data = auth_manager.get_user_by_id(user_id)
-        print(f"Updated user data: {user_data}")
-    else:
-        print("Failed to change admin status")
+        # Example: Set admin status for a regular user
+        print("\nChanging user to admin...")
+        if auth_manager.set_admin_status(user_id, True):
+            print("User is now an admin")
+            user_data = auth_manager.get_user_by_id(user_id)
+            print(f"Updated user data: {user_data}")
+        else:
+            print("Failed to change admin status")
     
-    # Example: Delete a user (soft delete)
-    print("\nDeleting admin user...")
-    if auth_manager.delete_user(admin_id):
-        print("Admin user deleted successfully")
+        # Example: Delete a user (soft delete)
+        print("\nDeleting admin user...")
+        if auth_manager.delete_user(admin_id):
+            print("Admin user deleted successfully")
         
-        # Try to authenticate with deleted user
-        admin_data = auth_manager.verify_user("adminuser", "adminPass456")
-        if admin_data:
-            print("Warning: Deleted user can still authenticate!")
+            # Try to authenticate with deleted user
+            admin_data = auth_manager.verify_user("adminuser", "adminPass456")
+            if admin_data:
+                print("Warning: Deleted user can still authenticate!")
+            else:
+                print("Deleted user cannot authenticate (expected behavior)")
         else:
-            print("Deleted user cannot authenticate (expected behavior)")
-    else:
-        print("Failed to delete admin user")
+            print("Failed to delete admin user")
+    
+    auth_manager.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
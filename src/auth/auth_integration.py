@@ -1,9 +1,11 @@
+import sqlite3
 from src.auth.user_authentication import UserAuthentication
 
 class ExpenseAuthIntegration:
     def __init__(
             self,
-            db_path: str = "database/app.db"
+            db_path: str = "database/app.db",
+            connection: sqlite3.Connection | None = None
         ) -> None:
 
         """
@@ -11,8 +13,10 @@ class ExpenseAuthIntegration:
         
         Args:
             db_path: Path to the SQLite database
+            connection: Optional autocommit connection (see open_db) to share
+                instead of opening one
         """
-        self.auth_manager = UserAuthentication(db_path=db_path)
+        self.auth_manager = UserAuthentication(db_path=db_path, connection=connection)
         
         # Keep track of the currently logged-in user
         self.current_user = None
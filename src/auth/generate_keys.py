@@ -1,40 +1,54 @@
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
-import os
-
-def generate_keys(private_key_path="keys\private_key.pem", public_key_path="keys\public_key.pem"):
-    # Generate a private key
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
-    )
-    
+from pathlib import Path
+
+def generate_keys(private_key_path=Path("keys") / "private_key.pem",
+                  public_key_path=Path("keys") / "public_key.pem"):
+    private_key_path = Path(private_key_path)
+    public_key_path = Path(public_key_path)
+
+    # Key generation is a one-time install step; replacing an existing pair would
+    # make every legacy password and sealed message unreadable
+    if private_key_path.exists():
+        if public_key_path.exists():
+            print(f"Keys already exist at {private_key_path}, leaving them untouched")
+            return
+
+        # Only the public half is missing, so rebuild it without generating a new pair
+        with open(private_key_path, "rb") as f:
+            private_key = serialization.load_pem_private_key(f.read(), password=None)
+    else:
+        # Generate a private key
+        private_key = rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048,
+            backend=default_backend()
+        )
+
+        # Write private key to file, creating its directory if it doesn't exist
+        private_key_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(private_key_path, "wb") as f:
+            f.write(private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            ))
+        print(f"Private key written to {private_key_path}")
+
     # Extract the public key from the private key
     public_key = private_key.public_key()
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(private_key_path), exist_ok=True)
-    os.makedirs(os.path.dirname(public_key_path), exist_ok=True)
-    
-    # Write private key to file
-    with open(private_key_path, "wb") as f:
-        f.write(private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ))
-    
+
     # Write public key to file
+    if public_key_path.parent != private_key_path.parent:
+        public_key_path.parent.mkdir(parents=True, exist_ok=True)
     with open(public_key_path, "wb") as f:
         f.write(public_key.public_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ))
-    
-    print(f"Private key written to {private_key_path}")
+
     print(f"Public key written to {public_key_path}")
 
 if __name__ == "__main__":
-    generate_keys()
\ No newline at end of file
+    generate_keys()
@@ -1,12 +1,18 @@
-import sqlite3
+from functools import lru_cache
 from src.auth.auth import UserAuth
+from src.auth.user_authentication import UserAuthentication
 
-# Initialize the UserAuth class for password encryption
+# Initialize the UserAuth class for password hashing
 auth = UserAuth()
 
+@lru_cache(maxsize=1)
+def get_auth_manager():
+    """Create the user manager, and with it the database connection, on first use"""
+    return UserAuthentication(db_path='database/app.db')
+
 def hash_password(password):
     """
-    Hash a password using RSA encryption
+    Hash a password using Argon2id
     
     Args:
         password: The plaintext password to hash
@@ -14,7 +20,7 @@ def hash_password(password):
     Returns:
         The hashed password as a string
     """
-    return auth.encode(password)
+    return auth.hash_password(password)
 
 def verify_password(hashed_password, plaintext_password):
     """
@@ -27,11 +33,7 @@ def verify_password(hashed_password, plaintext_password):
     Returns:
         True if the password matches, False otherwise
     """
-    try:
-        decrypted = auth.decode(hashed_password)
-        return decrypted == plaintext_password
-    except Exception:
-        return False
+    return auth.verify_password(hashed_password, plaintext_password)
 
 def create_user(username, password, is_admin=False):
     """
@@ -45,32 +47,7 @@ def create_user(username, password, is_admin=False):
     Returns:
         user_id if successful, None otherwise
     """
-    # Hash the password
-    password_hash = hash_password(password)
-    
-    # Connect to the database
-    conn = sqlite3.connect('database/app.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Insert the new user with the hashed password
-        cursor.execute('''
-        INSERT INTO users (username, password_hash, is_admin)
-        VALUES (?, ?, ?)
-        ''', (username, password_hash, is_admin))
-        
-        # Get the new user ID
-        user_id = cursor.lastrowid
-        
-        # Commit the changes
-        conn.commit()
-        
-        return user_id
-    except sqlite3.IntegrityError:
-        # Username already exists
-        return None
-    finally:
-        conn.close()
+    return get_auth_manager().register_user(username, password, is_admin)
 
 def authenticate_user(username, password):
     """
@@ -83,32 +60,7 @@ def authenticate_user(username, password):
     Returns:
         User data dictionary if authenticated, None otherwise
     """
-    # Connect to the database
-    conn = sqlite3.connect('database/app.db')
-    cursor = conn.cursor()
-    
-    # Find the user
-    cursor.execute('''
-    SELECT user_id, username, password_hash, is_admin
-    FROM users
-    WHERE username = ? AND is_deleted = 0
-    ''', (username,))
-    
-    user_data = cursor.fetchone()
-    conn.close()
-    
-    if not user_data:
-        return None
-    
-    # Check the password
-    if verify_password(user_data[2], password):
-        return {
-            'user_id': user_data[0],
-            'username': user_data[1],
-            'is_admin': bool(user_data[3])
-        }
-    
-    return None
+    return get_auth_manager().verify_user(username, password)
 
 def main():
     """Example of using the password hashing functions"""
@@ -1,55 +1,142 @@
+import os
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from src.auth.auth import UserAuth
+from database.init_db import open_db
+
+# Statement text is kept in one place so every call hits the same entry in the
+# connection's prepared statement cache
+INSERT_USERS_SQL = (
+    "INSERT INTO users (username, password_hash, is_admin) VALUES (?, ?, ?) "
+    "ON CONFLICT(username) DO NOTHING"
+)
+INSERT_USER_SQL = "INSERT INTO users (username, password_hash, is_admin) VALUES (?, ?, ?) RETURNING user_id"
+SELECT_USER_BY_NAME_SQL = (
+    'SELECT user_id, username, password_hash, is_admin AS "is_admin [BOOLEAN]" FROM users '
+    "WHERE username = ? AND is_deleted = 0"
+)
+SELECT_USER_BY_ID_SQL = (
+    'SELECT user_id, username, is_admin AS "is_admin [BOOLEAN]" FROM users '
+    "WHERE user_id = ? AND is_deleted = 0"
+)
+UPDATE_PASSWORD_SQL = (
+    "UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP "
+    "WHERE user_id = ? AND is_deleted = 0"
+)
+# The UPDATEs skip rows already in the requested state so no-op calls don't write
+DELETE_USER_SQL = (
+    "UPDATE users SET is_deleted = 1, updated_at = CURRENT_TIMESTAMP "
+    "WHERE user_id = ? AND is_deleted = 0"
+)
+SET_ADMIN_SQL = (
+    "UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP "
+    "WHERE user_id = ? AND is_deleted = 0 AND is_admin IS NOT ?"
+)
+USER_EXISTS_SQL = "SELECT 1 FROM users WHERE user_id = ?"
+ACTIVE_USER_EXISTS_SQL = "SELECT 1 FROM users WHERE user_id = ? AND is_deleted = 0"
+SELECT_IS_ADMIN_SQL = 'SELECT is_admin AS "is_admin [BOOLEAN]" FROM users WHERE user_id = ? AND is_deleted = 0'
+
+# Each Argon2id hash holds 64 MiB while it runs, so register_users hashes at most
+# this many passwords at once
+MAX_HASH_WORKERS = min(os.cpu_count() or 1, 4)
 
 class UserAuthentication:
-    def __init__(self, db_path="database/app.db"):
+    def __init__(self, db_path="database/app.db", connection=None):
         """
         Initialize the user authentication manager
         
         Args:
             db_path: Path to the SQLite database
+            connection: Optional autocommit connection (see open_db) to share
+                instead of opening one
         """
         self.db_path = db_path
         self.auth = UserAuth()
-    
-    def _get_connection(self):
-        """Create and return a database connection"""
-        return sqlite3.connect(self.db_path)
+        # Keep one connection for the lifetime of the manager so the page cache and
+        # prepared statements survive between calls
+        self.owns_connection = connection is None
+        self.conn = open_db(db_path) if self.owns_connection else connection
+
+    def close(self):
+        """Close the connection if it was opened by this manager"""
+        if self.owns_connection:
+            self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several calls into a single transaction
+        
+        Joins the enclosing transaction if one is already open on the connection.
+        
+        Yields:
+            A cursor on the manager's connection
+        """
+        cursor = self.conn.cursor()
+        if self.conn.in_transaction:
+            yield cursor
+            return
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
     
     def register_user(self, username, password, is_admin=False):
         """
-        Register a new user with an encrypted password
+        Register a new user with a hashed password
         
         Args:
             username: Username for the new user
-            password: Plain text password to be encrypted
+            password: Plain text password to be hashed
             is_admin: Boolean indicating if user is admin
             
         Returns:
             user_id if successful, None if username already exists
         """
-        # Encrypt the password using the UserAuth class
-        password_hash = self.auth.encode(password)
+        # Hash the password using the UserAuth class
+        password_hash = self.auth.hash_password(password)
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         try:
-            cursor.execute('''
-            INSERT INTO users (username, password_hash, is_admin)
-            VALUES (?, ?, ?)
-            ''', (username, password_hash, is_admin))
-            
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
+            return cursor.execute(INSERT_USER_SQL, (username, password_hash, is_admin)).fetchone()[0]
             
         except sqlite3.IntegrityError:
             # Username already exists
             return None
-        finally:
-            conn.close()
-    
+
+    def register_users(self, users):
+        """
+        Register several users in a single transaction
+
+        Args:
+            users: Iterable of (username, password, is_admin) tuples
+
+        Returns:
+            Number of users registered; usernames that already exist are skipped
+        """
+        users = list(users)
+        
+        # Hash every password before taking the write lock. Argon2 releases the GIL,
+        # so the hashes are computed in parallel threads
+        with ThreadPoolExecutor(max_workers=MAX_HASH_WORKERS) as executor:
+            password_hashes = executor.map(self.auth.hash_password, [user[1] for user in users])
+            rows = [
+                (username, password_hash, is_admin)
+                for (username, _, is_admin), password_hash in zip(users, password_hashes)
+            ]
+
+        with self.transaction() as cursor:
+            cursor.executemany(INSERT_USERS_SQL, rows)
+            registered = cursor.rowcount
+
+        return registered
+
     def verify_user(self, username, password):
         """
         Verify user credentials
@@ -61,40 +148,32 @@ class UserAuthentication:
         Returns:
             User data dictionary if credentials are valid, None otherwise
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
-        cursor.execute('''
-        SELECT user_id, username, password_hash, is_admin
-        FROM users
-        WHERE username = ? AND is_deleted = 0
-        ''', (username,))
+        cursor.execute(SELECT_USER_BY_NAME_SQL, (username,))
         
         user_data = cursor.fetchone()
-        conn.close()
         
         if not user_data:
             return None
         
-        # Get the encrypted password from the database
+        # Get the password hash from the database
         password_hash = user_data[2]
         
-        # Decrypt the password
-        try:
-            decrypted_password = self.auth.decode(password_hash)
-            
-            # Check if the provided password matches the decrypted one
-            if password == decrypted_password:
-                return {
-                    'user_id': user_data[0],
-                    'username': user_data[1],
-                    'is_admin': bool(user_data[3])
-                }
-        except Exception:
-            # Decryption failed or password doesn't match
-            pass
+        # Check the provided password against the stored hash
+        if not self.auth.verify_password(password_hash, password):
+            return None
         
-        return None
+        # Upgrade legacy encrypted passwords and outdated hashes now that the
+        # plaintext is known to be correct
+        if self.auth.needs_rehash(password_hash):
+            self.update_password(user_data[0], password)
+        
+        return {
+            'user_id': user_data[0],
+            'username': user_data[1],
+            'is_admin': user_data[3]
+        }
     
     def update_password(self, user_id, new_password):
         """
@@ -102,31 +181,19 @@ class UserAuthentication:
         
         Args:
             user_id: ID of the user whose password is being updated
-            new_password: New password to encrypt and store
+            new_password: New password to hash and store
             
         Returns:
             True if successful, False otherwise
         """
-        # Encrypt the new password
-        password_hash = self.auth.encode(new_password)
+        # Hash the new password
+        password_hash = self.auth.hash_password(new_password)
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
-        try:
-            cursor.execute('''
-            UPDATE users
-            SET password_hash = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ? AND is_deleted = 0
-            ''', (password_hash, user_id))
-            
-            if cursor.rowcount > 0:
-                conn.commit()
-                return True
-            else:
-                return False
-        finally:
-            conn.close()
+        cursor.execute(UPDATE_PASSWORD_SQL, (password_hash, user_id))
+        
+        return cursor.rowcount > 0
     
     def get_user_by_id(self, user_id):
         """
@@ -138,24 +205,17 @@ class UserAuthentication:
         Returns:
             User data dictionary if found, None otherwise
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        # The selected columns are exactly the public user fields, so the row can
+        # be turned into the result dictionary by name
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        cursor.execute('''
-        SELECT user_id, username, is_admin
-        FROM users
-        WHERE user_id = ? AND is_deleted = 0
-        ''', (user_id,))
+        cursor.execute(SELECT_USER_BY_ID_SQL, (user_id,))
         
         user_data = cursor.fetchone()
-        conn.close()
         
         if user_data:
-            return {
-                'user_id': user_data[0],
-                'username': user_data[1],
-                'is_admin': bool(user_data[2])
-            }
+            return dict(user_data)
         
         return None
         
@@ -169,23 +229,14 @@ class UserAuthentication:
         Returns:
             True if successful, False otherwise
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
-        try:
-            cursor.execute('''
-            UPDATE users
-            SET is_deleted = 1, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-            ''', (user_id,))
-            
-            if cursor.rowcount > 0:
-                conn.commit()
-                return True
-            else:
-                return False
-        finally:
-            conn.close()
+        cursor.execute(DELETE_USER_SQL, (user_id,))
+        if cursor.rowcount > 0:
+            return True
+        
+        # Deleting an already deleted user still counts as success
+        return cursor.execute(USER_EXISTS_SQL, (user_id,)).fetchone() is not None
             
     def set_admin_status(self, user_id, is_admin):
         """
@@ -198,20 +249,36 @@ class UserAuthentication:
         Returns:
             True if successful, False otherwise
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
-        try:
-            cursor.execute('''
-            UPDATE users
-            SET is_admin = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ? AND is_deleted = 0
-            ''', (is_admin, user_id))
+        cursor.execute(SET_ADMIN_SQL, (is_admin, user_id, is_admin))
+        if cursor.rowcount > 0:
+            return True
+        
+        # The user may already have the requested status
+        return self.user_exists(user_id)
+
+    def user_exists(self, user_id):
+        """
+        Check whether an active user exists
+        
+        Args:
+            user_id: ID of the user to look up
+            
+        Returns:
+            True if the user exists and is not deleted, False otherwise
+        """
+        return self.conn.execute(ACTIVE_USER_EXISTS_SQL, (user_id,)).fetchone() is not None
+
+    def get_is_admin(self, user_id):
+        """
+        Get only the admin flag of a user
+        
+        Args:
+            user_id: ID of the user to look up
             
-            if cursor.rowcount > 0:
-                conn.commit()
-                return True
-            else:
-                return False
-        finally:
-            conn.close()
\ No newline at end of file
+        Returns:
+            True if the user is an active admin, False otherwise
+        """
+        row = self.conn.execute(SELECT_IS_ADMIN_SQL, (user_id,)).fetchone()
+        return bool(row and row[0])
\ No newline at end of file
@@ -6,60 +6,83 @@ from database.init_db import update_reporting_db
 import os
 import sqlite3
 
-   
+
+def parse_amount_range(value):
+    """Parse an amount_range filter value of the form 'min-max' into a tuple"""
+    min_amount, max_amount = map(float, value.split("-"))
+    return (min_amount, max_amount)
+
+# Parser for each list_expenses filter; unlisted filters are rejected
+FILTER_PARSERS = {
+    "category": str,
+    "date": str,
+    "payment_method": str,
+    "amount_range": parse_amount_range,
+}
+
 class CommandHandler:
+    # Instances only carry per-session state; the command tables below live on the class
+    __slots__ = ("auth", "expense_manager", "report_handler", "current_user", "allowed_commands")
+
+    # Commands in the order help lists them, each handled by handle_<command>
+    commands = (
+        "help",
+        "login",
+        "logout",
+        "list_users",
+        "add_user",
+        "add_category",
+        "list_categories",
+        "add_payment_method",
+        "list_payment_methods",
+        "add_expense",
+        "update_expense",
+        "delete_expense",
+        "list_expenses",
+        "import_expenses",
+        "export_csv",
+        "report",
+        "update_report_db",
+        "begin",
+        "commit",
+    )
+    command_set = frozenset(commands)
+
+    # Commands restricted to admins
+    admin_only_commands = frozenset({
+        "add_user",
+        "add_category",
+        "import_expenses",
+        "export_csv",
+        "list_users",
+        "report",
+        "update_report_db"
+    })
+    user_commands = command_set - admin_only_commands
+
     def __init__(self, db_connection, reporting_db_connection, auth: ExpenseAuthIntegration):
         self.auth = auth  # Pass the auth instance to check user roles
         self.expense_manager = ExpenseManager(db_connection, auth)
         self.report_handler = ReportHandler(reporting_db_connection)
-        if auth.get_current_user(): self.expense_importer = ExpenseCSVImporter(current_user_id=auth.get_current_user().get("user_id", 0))
+        # Logged-in user and the commands they may run, both settled at login so
+        # dispatch is a single set lookup
         self.current_user = None
-        self.command_map = {
-            "help": self.handle_help,
-            "login": self.handle_login,
-            "logout": self.handle_logout,
-            "list_users": self.handle_list_users,
-            "add_user": self.handle_add_user,
-            "add_category": self.handle_add_category,
-            "list_categories": self.handle_list_categories,
-            "add_payment_method": self.handle_add_payment_method,
-            "list_payment_methods": self.handle_list_payment_methods,
-            "add_expense": self.handle_add_expense,
-            "update_expense": self.handle_update_expense,
-            "delete_expense": self.handle_delete_expense,
-            "list_expenses": self.handle_list_expenses,
-            "import_expenses": self.handle_import_expenses,
-            "export_csv": self.handle_export_csv,
-            "report" : self.handle_report,
-            "update_report_db" : self.handle_update_report_db,
-        }
-        self.admin_only_commands = {
-            "add_user",
-            "add_category",
-            "import_expenses",
-            "export_csv",
-            "list_users",
-            "report",
-            "update_report_db"
-        }  # Commands restricted to admins
+        self.allowed_commands = self.user_commands
 
     def execute_command(self, command, args):
-        if command not in self.command_map:
-            raise ValueError(f"Unknown command: {command}")
-
-        # Check if the command is admin-only
-        if command in self.admin_only_commands:
-            current_user = self.auth.get_current_user()
-            if not current_user or not self.auth.is_admin():
+        if command not in self.allowed_commands:
+            # Check if the command is admin-only
+            if command in self.admin_only_commands:
                 raise ValueError("This command is restricted to admin users.")
+            raise ValueError(f"Unknown command: {command}")
 
         # Execute the command
-        return self.command_map[command](args)
+        return getattr(self, "handle_" + command)(args)
 
     def handle_help(self, args):
         """Display help information."""
         help_text = "Available commands:\n"
-        for command in self.command_map.keys():
+        for command in self.commands:
             help_text += f"  - {command}\n"
         return help_text
 
@@ -68,20 +91,18 @@ class CommandHandler:
         if len(args) != 2:
             return "Usage: login <username> <password>"
         username, password = args
-        user = self.auth.verify_user(username, password)
-        if user:
-            self.current_user = user
-            return f"Login successful. Welcome, {username}!"
-        else:
-            return "Invalid username or password."
+        success, message = self.auth.login(username, password)
+        if success:
+            self.current_user = self.auth.get_current_user()
+            self.allowed_commands = self.command_set if self.current_user.get("is_admin") else self.user_commands
+        return message
 
     def handle_logout(self, args):
         """Handle user logout."""
-        if self.current_user:
-            self.current_user = None
-            return "Logout successful."
-        else:
-            return "No user is currently logged in."
+        success, message = self.auth.logout()
+        self.current_user = None
+        self.allowed_commands = self.user_commands
+        return message
 
     def handle_list_users(self, args):
         """List all users."""
@@ -91,18 +112,11 @@ class CommandHandler:
         """Handle adding a new user (admin only)."""
         if len(args) != 3:
             return "Usage: add_user <username> <password> <is_admin (0 or 1)>"
-        
-        current_user = self.auth.get_current_user()
-        if not current_user or not self.auth.is_admin():
-            raise ValueError("Only admins can add new users.")
     
+        # Admin rights were already checked by execute_command
         username, password, is_admin = args
         is_admin = bool(int(is_admin))  # Convert to boolean
     
-        # Ensure only admins can create another admin
-        if is_admin and not self.auth.is_admin():
-            raise ValueError("Only admins can create another admin user.")
-    
         return self.expense_manager.add_user(username, password, is_admin)
 
     def handle_add_category(self, args):
@@ -162,27 +176,38 @@ class CommandHandler:
             if "=" in arg:
                 key, value = arg.split("=", 1)
                 key = key.strip()
-                value = value.strip()
     
-                if key in ["category", "date", "payment_method"]:
-                    filters[key] = value
-                elif key == "amount_range":
-                    # Parse amount range as a tuple
-                    try:
-                        min_amount, max_amount = map(float, value.split("-"))
-                        filters[key] = (min_amount, max_amount)
-                    except ValueError:
-                        return "Error: Invalid amount range format. Use 'amount_range=min-max'."
-                else:
+                parse_filter = FILTER_PARSERS.get(key)
+                if parse_filter is None:
                     return f"Error: Unsupported filter '{key}'."
+                try:
+                    filters[key] = parse_filter(value.strip())
+                except ValueError:
+                    return "Error: Invalid amount range format. Use 'amount_range=min-max'."
     
         # Call the expense manager with parsed filters
         return self.expense_manager.list_expenses(filters=filters)
 
+    def handle_begin(self, args):
+        """Group the following commands into one transaction."""
+        if len(args) != 0:
+            return "Usage: begin"
+        return self.expense_manager.begin_batch()
+
+    def handle_commit(self, args):
+        """Save every change made since begin."""
+        if len(args) != 0:
+            return "Usage: commit"
+        return self.expense_manager.commit_batch()
+
     def handle_import_expenses(self, args):
         """Import expenses from a file."""
         if len(args) != 1:
             return "Usage: import_expenses <file_path>"
+
+        # The importer writes through its own connection, which would wait on the batch's lock
+        if self.expense_manager.db.in_transaction:
+            return "Error: Commit the open batch before importing."
     
         file_path = args[0]
     
@@ -190,17 +215,18 @@ class CommandHandler:
         if not os.path.exists(file_path):
             return f"Error: File '{file_path}' does not exist."
     
-        # Initialize the ExpenseCSVImporter
-        current_user = self.auth.get_current_user()
-        if not current_user:
+        # Initialize the ExpenseCSVImporter for the user cached at login
+        if not self.current_user:
             return "Error: No user is currently logged in."
     
-        user_id = current_user.get("user_id")
+        user_id = self.current_user.get("user_id")
         csv_importer = ExpenseCSVImporter(auth=self.auth, current_user_id=user_id)
     
         # Import the expenses from the CSV file
         try:
             success = csv_importer.import_expenses_csv(file_path)
+            # The importer may have created categories and payment methods
+            self.expense_manager.clear_list_cache()
             if success:
                 return f"Expenses imported successfully from '{file_path}'."
             else:
@@ -214,6 +240,11 @@ class CommandHandler:
         if len(args) != 0:
             return "Update report db takes no other arguments"
 
+        # The sync reads app.db through its own connection, which would wait on the
+        # batch's lock and could not see its uncommitted changes anyway
+        if self.expense_manager.db.in_transaction:
+            return "Error: Commit the open batch before updating the reporting db."
+
         try:
             update_reporting_db()
             return "Successfully updated reporting db"
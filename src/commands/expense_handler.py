@@ -1,27 +1,212 @@
+import csv
+import re
 import sqlite3
+import time
+from copy import copy
 from datetime import datetime
 from sqlite3.dbapi2 import Connection
 from typing import List, Dict, Optional, Union
 from src.auth.auth_integration import ExpenseAuthIntegration
 
+# Statement text is built once so repeated commands reuse the cached prepared statements.
+# The expense INSERT resolves the category and payment method names itself and
+# inserts nothing when either name is unknown
+INSERT_EXPENSE_SQL = """
+    INSERT INTO expenses (user_id, category_id, payment_method_id, amount, description, expense_date, tag, created_at, updated_at)
+    SELECT ?, c.category_id, p.payment_method_id, ?, ?, ?, ?, ?, ?
+    FROM categories c, payment_methods p
+    WHERE c.category_name = ? AND c.is_deleted = 0 AND p.name = ? AND p.is_deleted = 0
+"""
+# Bulk variant for add_expenses, which resolves the ids itself
+INSERT_EXPENSE_IDS_SQL = """
+    INSERT INTO expenses (user_id, category_id, payment_method_id, amount, description, expense_date, tag, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_CATEGORY_SQL = "INSERT INTO categories (category_name, user_id) VALUES (?, ?)"
+INSERT_PAYMENT_METHOD_SQL = "INSERT INTO payment_methods (name) VALUES (?)"
+LIST_CATEGORIES_SQL = "SELECT category_name FROM categories WHERE is_deleted = 0 ORDER BY category_name"
+LIST_PAYMENT_METHODS_SQL = "SELECT name FROM payment_methods WHERE is_deleted = 0 ORDER BY name"
+SELECT_CATEGORY_ID_SQL = "SELECT category_id FROM categories WHERE category_name = ? AND is_deleted = 0"
+SELECT_PAYMENT_METHOD_ID_SQL = "SELECT payment_method_id FROM payment_methods WHERE name = ? AND is_deleted = 0"
+EXPENSE_EXISTS_SQL = "SELECT 1 FROM expenses WHERE expense_id = ? AND is_deleted = 0"
+
+# The expense UPDATEs carry the ownership check in their WHERE clause: the row must be
+# active and belong to the user, unless the user is an admin
+EXPENSE_ACCESS_CLAUSE = "expense_id = ? AND is_deleted = 0 AND (user_id = ? OR ?)"
+DELETE_EXPENSE_SQL = f"UPDATE expenses SET is_deleted = 1, updated_at = ? WHERE {EXPENSE_ACCESS_CLAUSE}"
+
+# Fields update_expense may change, each with its own fixed UPDATE statement
+UPDATE_EXPENSE_SQL = {
+    field: f"UPDATE expenses SET {field} = ?, updated_at = ? WHERE {EXPENSE_ACCESS_CLAUSE}"
+    for field in ("amount", "description", "tag", "expense_date", "category_id", "payment_method_id")
+}
+
+LIST_USERS_SQL = 'SELECT user_id, username, is_admin AS "is_admin [BOOLEAN]" FROM users WHERE is_deleted = 0'
+
+LIST_EXPENSES_SQL = """
+    SELECT 
+        e.expense_id, e.amount, e.description, e.tag, e.expense_date AS date,
+        c.category_name AS category, p.name as payment_method,
+        u.username
+    FROM expenses e
+    JOIN categories c ON e.category_id = c.category_id
+    JOIN payment_methods p ON e.payment_method_id = p.payment_method_id
+    JOIN users u ON e.user_id = u.user_id
+    WHERE e.is_deleted = 0
+"""
+
+# Filter clauses appended to LIST_EXPENSES_SQL, always in this order so each
+# combination of filters maps to a single statement text
+LIST_EXPENSES_FILTERS = {
+    "category": " AND e.category_id = ?",
+    "date": " AND e.expense_date = ?",
+    "amount_range": " AND e.amount BETWEEN ? AND ?",
+    "payment_method": " AND e.payment_method_id = ?",
+}
+
+def build_list_expenses_queries():
+    """
+    Build every list_expenses statement up front
+
+    Returns:
+        Dict keyed by (own_only, mask), where own_only restricts the listing to one
+        user and bit i of mask enables the i-th clause of LIST_EXPENSES_FILTERS
+    """
+    queries = {}
+    for own_only in (False, True):
+        for mask in range(1 << len(LIST_EXPENSES_FILTERS)):
+            query = LIST_EXPENSES_SQL + (" AND e.user_id = ?" if own_only else "")
+            for bit, clause in enumerate(LIST_EXPENSES_FILTERS.values()):
+                if mask & (1 << bit):
+                    query += clause
+            # Listed in id order whichever index the planner picks
+            queries[own_only, mask] = query + " ORDER BY e.expense_id"
+    return queries
+
+LIST_EXPENSES_QUERIES = build_list_expenses_queries()
+
+# Tables export_data accepts. users is left out so password hashes never end up in a file
+EXPORT_TABLES = frozenset({"expenses", "categories", "payment_methods"})
+# Table names can't be bound as parameters, so the plain table exports are spelled out
+# per whitelisted table; expenses are exported through EXPORT_EXPENSES_SQL
+EXPORT_TABLE_SQL = {
+    table: f'SELECT * FROM "{table}" WHERE is_deleted = 0'
+    for table in ("categories", "payment_methods")
+}
+# Exports are written in 1 MiB chunks rather than the default 8 KiB
+EXPORT_BUFFER_SIZE = 1 << 20
+EXPORT_EXPENSES_SQL = """
+    SELECT e.expense_id, e.user_id, c.category_name, p.name as payment_method_name,
+           e.amount, e.expense_date, e.description, e.tag
+    FROM expenses e
+    JOIN categories c ON e.category_id = c.category_id
+    JOIN payment_methods p ON e.payment_method_id = p.payment_method_id
+    WHERE e.is_deleted = 0
+"""
+
+# How long list_categories, list_payment_methods and list_users reuse a result, in seconds.
+# Writes through ExpenseManager drop the affected listing straight away
+LIST_CACHE_TTL = 30
+
+DATE_FORMAT_ERROR = "Error: Incorrect date format. Expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Tells the two accepted shapes apart up front so only the matching format is tried
+# for the common zero-padded input
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2})?")
+
+def parse_expense_date(value):
+    """Normalize a YYYY-MM-DD or YYYY-MM-DD HH:MM:SS date, or return None if it is neither"""
+    match = DATE_PATTERN.fullmatch(value)
+    if match is not None:
+        try:
+            # The pattern only checks the shape; this still rejects e.g. month 13
+            datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        # A value of the matched shape is already in canonical form
+        return value if match.group(1) else value + " 00:00:00"
+
+    # Unpadded values such as 2024-1-5 are still accepted through strptime
+    for date_format in (DATETIME_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format).strftime(DATETIME_FORMAT)
+        except ValueError:
+            pass
+    return None
+
+def first_column(cursor, row):
+    """Row factory for single-column queries that returns the bare value"""
+    return row[0]
+
 class ExpenseManager:
     def __init__(self, db_connection: Connection, auth: ExpenseAuthIntegration):
         self.db = db_connection
         self.auth = auth
+        # Shared cursor for every statement whose results are consumed before the method
+        # returns; only queries that need their own row factory open a separate cursor
+        self.cursor = db_connection.cursor()
+        # Name to id maps for categories and payment methods. Only names that exist are
+        # cached, and neither table is ever renamed or deleted from, so entries never go stale
+        self.category_ids: Dict[str, int] = {}
+        self.payment_method_ids: Dict[str, int] = {}
+        # Results of the small list_* reads, keyed by listing: (time loaded, result)
+        self.list_cache: Dict[object, tuple] = {}
+
+    def cached_list(self, key, load):
+        """
+        Return a list_* result from the cache, loading it if missing or expired
+
+        Args:
+            key: Cache key of the listing
+            load: Callable that queries the listing
+        """
+        now = time.monotonic()
+        entry = self.list_cache.get(key)
+        if entry is None or now - entry[0] >= LIST_CACHE_TTL:
+            entry = self.list_cache[key] = (now, load())
+        return copy(entry[1])
+
+    def clear_list_cache(self):
+        """Drop every cached listing, for writes that don't go through this manager"""
+        self.list_cache.clear()
+
+    def begin_batch(self) -> str:
+        """
+        Open a transaction that the following writes join until commit_batch
+
+        The connection is in autocommit mode, so outside a batch every write is
+        committed (and synced) on its own.
+        """
+        if self.db.in_transaction:
+            return "Error: A batch is already open."
+        self.cursor.execute("BEGIN IMMEDIATE")
+        return "Batch started. Changes will be saved together on 'commit'."
+
+    def commit_batch(self) -> str:
+        """Commit the transaction opened by begin_batch"""
+        if not self.db.in_transaction:
+            return "Error: No batch is open."
+        self.cursor.execute("COMMIT")
+        return "Batch committed."
 
     def list_users(self, format_as_table: bool = True) -> Union[List[Dict[str, Union[int, str, bool]]], str]:
-        cursor = self.db.cursor()
-        cursor.execute("SELECT user_id, username, is_admin FROM users WHERE is_deleted = 0")
-        users = cursor.fetchall()
-        
-        user_list = [{"user_id": user[0], "username": user[1], "is_admin": bool(user[2])} for user in users]
-        
+        return self.cached_list(("users", format_as_table), lambda: self.load_users(format_as_table))
+
+    def load_users(self, format_as_table: bool):
         if not format_as_table:
-            return user_list
+            # Columns are named after the result keys so each row converts straight to a dict
+            cursor = self.db.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(LIST_USERS_SQL)
+            return [dict(user) for user in cursor]
             
-        # Format as table
+        # Format as table, streaming rows from the cursor into the renderer
+        cursor = self.cursor.execute(LIST_USERS_SQL)
         headers = ['User ID', 'Username', 'Admin']
-        formatted_data = [(u["user_id"], u["username"], "Yes" if u["is_admin"] else "No") for u in user_list]
+        formatted_data = (
+            (user_id, username, "Yes" if is_admin else "No")
+            for user_id, username, is_admin in cursor
+        )
         
         return self._format_tabular_report(
             "User List", 
@@ -30,50 +215,77 @@ class ExpenseManager:
         )
 
     def add_user(self, username: str, password: str, role: int) -> str:
-        current_user = self.auth.get_current_user()
-        if not current_user or not current_user.get("is_admin"):
-            return "Error: Only admins can add users."
+        """Register a user. Admin-only: callers must check rights (see CommandHandler)."""
         role = role == 1
 
-        return self.auth.register_new_user(username, password, role)
+        result = self.auth.register_new_user(username, password, role)
+        if result[0]:
+            self.list_cache.pop(("users", True), None)
+            self.list_cache.pop(("users", False), None)
+        return result
 
 
     def add_category(self, category_name: str) -> str:
+        """Add a category. Admin-only: callers must check rights (see CommandHandler)."""
         current_user = self.auth.get_current_user()
-        if not current_user or not current_user.get("is_admin"):
-            return "Error: Only admins can add categories."
 
-        cursor = self.db.cursor()
+        cursor = self.cursor
         try:
             cursor.execute(
-                "INSERT INTO categories (category_name, user_id) VALUES (?, ?)",
+                INSERT_CATEGORY_SQL,
                 (category_name, current_user["user_id"]),
             )
-            self.db.commit()
+            self.list_cache.pop("categories", None)
             return f"Category '{category_name}' added successfully."
         except sqlite3.IntegrityError:
             return f"Error: Category '{category_name}' already exists."
 
+    def get_category_id(self, category_name: str) -> Optional[int]:
+        """Look up an active category's id, or None if there is no such category"""
+        category_id = self.category_ids.get(category_name)
+        if category_id is None:
+            row = self.cursor.execute(SELECT_CATEGORY_ID_SQL, (category_name,)).fetchone()
+            if row is None:
+                return None
+            category_id = self.category_ids[category_name] = row[0]
+        return category_id
+
     def list_categories(self) -> List[str]:
+        return self.cached_list("categories", self.load_categories)
+
+    def load_categories(self) -> List[str]:
         cursor = self.db.cursor()
-        cursor.execute("SELECT category_name FROM categories WHERE is_deleted = 0")
-        categories = cursor.fetchall()
-        return [category[0] for category in categories]
+        cursor.row_factory = first_column
+        cursor.execute(LIST_CATEGORIES_SQL)
+        return cursor.fetchall()
 
     def add_payment_method(self, method_name: str) -> str:
-        cursor = self.db.cursor()
+        cursor = self.cursor
         try:
-            cursor.execute("INSERT INTO payment_methods (name) VALUES (?)", (method_name,))
-            self.db.commit()
+            cursor.execute(INSERT_PAYMENT_METHOD_SQL, (method_name,))
+            self.list_cache.pop("payment_methods", None)
             return f"Payment method '{method_name}' added successfully."
         except sqlite3.IntegrityError:
             return f"Error: Payment method '{method_name}' already exists."
 
+    def get_payment_method_id(self, method_name: str) -> Optional[int]:
+        """Look up an active payment method's id, or None if there is no such method"""
+        payment_method_id = self.payment_method_ids.get(method_name)
+        if payment_method_id is None:
+            row = self.cursor.execute(SELECT_PAYMENT_METHOD_ID_SQL, (method_name,)).fetchone()
+            if row is None:
+                return None
+            payment_method_id = self.payment_method_ids[method_name] = row[0]
+        return payment_method_id
+
     def list_payment_methods(self) -> List[str]:
+        return self.cached_list("payment_methods", self.load_payment_methods)
+
+    def load_payment_methods(self) -> List[str]:
         cursor = self.db.cursor()
-        cursor.execute("SELECT name FROM payment_methods WHERE is_deleted = 0")
-        methods = cursor.fetchall()
-        return [method[0] for method in methods]
+        cursor.row_factory = first_column
+        cursor.execute(LIST_PAYMENT_METHODS_SQL)
+        return cursor.fetchall()
 
     def add_expense(self, amount: float, category: str, payment_method: str, date: str, description: Optional[str], tag: str) -> str:
         current_user = self.auth.get_current_user()
@@ -81,78 +293,106 @@ class ExpenseManager:
             return "Error: No user is currently logged in."
 
         user_id = current_user["user_id"]
-        cursor = self.db.cursor()
+        cursor = self.cursor
 
-        try:
-            dt = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            try:
-                dt = datetime.strptime(date, "%Y-%m-%d")
-                dt = dt.replace(hour=0, minute=0, second=0)
-            except ValueError:
-                return "Error: Incorrect date format. Expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"
-        date = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Get category_id and payment_method_id
-        cursor.execute("SELECT category_id FROM categories WHERE category_name = ? AND is_deleted = 0", (category,))
-        category_id = cursor.fetchone()
-        if not category_id:
-            return f"Error: Category '{category}' does not exist."
-
-        cursor.execute("SELECT payment_method_id FROM payment_methods WHERE name = ? AND is_deleted = 0", (payment_method,))
-        payment_method_id = cursor.fetchone()
-        if not payment_method_id:
-            return f"Error: Payment method '{payment_method}' does not exist."
+        date = parse_expense_date(date)
+        if date is None:
+            return DATE_FORMAT_ERROR
 
         # Set the created_at and updated_at timestamps
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = datetime.now().strftime(DATETIME_FORMAT)
 
         try:
             cursor.execute(
-                '''
-                INSERT INTO expenses (user_id, category_id, payment_method_id, amount, description, expense_date, tag, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (user_id, category_id[0], payment_method_id[0], amount, description, date, tag, timestamp, timestamp),
+                INSERT_EXPENSE_SQL,
+                (user_id, amount, description, date, tag, timestamp, timestamp, category, payment_method),
             )
-            self.db.commit()
-            return "Expense added successfully."
         except sqlite3.IntegrityError as e:
             return f"Failed to add expense: {e}"
 
+        if cursor.rowcount == 0:
+            # Nothing was inserted, so the category or the payment method is unknown
+            if self.get_category_id(category) is None:
+                return f"Error: Category '{category}' does not exist."
+            return f"Error: Payment method '{payment_method}' does not exist."
+
+        return "Expense added successfully."
+
+    def add_expenses(self, expenses: List[tuple]) -> str:
+        """
+        Add several expenses for the logged-in user in one transaction
+
+        Every row is validated before anything is written, so either all of them are
+        added or none are. Joins the open batch if there is one.
+
+        Args:
+            expenses: (amount, category, payment_method, date, description, tag) tuples
+        """
+        current_user = self.auth.get_current_user()
+        if not current_user:
+            return "Error: No user is currently logged in."
+
+        user_id = current_user["user_id"]
+        timestamp = datetime.now().strftime(DATETIME_FORMAT)
+
+        rows = []
+        for amount, category, payment_method, date, description, tag in expenses:
+            category_id = self.get_category_id(category)
+            if category_id is None:
+                return f"Error: Category '{category}' does not exist."
+            payment_method_id = self.get_payment_method_id(payment_method)
+            if payment_method_id is None:
+                return f"Error: Payment method '{payment_method}' does not exist."
+            date = parse_expense_date(date)
+            if date is None:
+                return DATE_FORMAT_ERROR
+            rows.append((user_id, category_id, payment_method_id, amount, description, date, tag, timestamp, timestamp))
+
+        cursor = self.cursor
+        if self.db.in_transaction:
+            cursor.executemany(INSERT_EXPENSE_IDS_SQL, rows)
+        else:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.executemany(INSERT_EXPENSE_IDS_SQL, rows)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+        return f"{len(rows)} expenses added successfully."
+
     def update_expense(self, expense_id: int, field: str, new_value: Union[str, float]) -> str:
         current_user = self.auth.get_current_user()
         if not current_user:
             return "Error: No user is currently logged in."
 
         user_id = current_user["user_id"]
-        cursor = self.db.cursor()
+        is_admin = bool(current_user.get("is_admin"))
+        cursor = self.cursor
+
+        update_sql = UPDATE_EXPENSE_SQL.get(field)
+        if update_sql is None:
+            return f"Error: Field '{field}' cannot be updated."
 
         if field == "expense_date":
-            try:
-                dt = datetime.strptime(new_value, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                try:
-                    dt = datetime.strptime(new_value, "%Y-%m-%d")
-                    dt = dt.replace(hour=0, minute=0, second=0)
-                except ValueError:
-                    return "Error: Incorrect date format. Expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"
-            new_value = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Check if the expense belongs to the logged-in user
-        cursor.execute("SELECT user_id FROM expenses WHERE expense_id = ? AND is_deleted = 0", (expense_id,))
-        expense_owner = cursor.fetchone()
-        if not expense_owner or expense_owner[0] != user_id or not self.auth.is_admin():
-            return "Error: You can only update your own expenses."
+            new_value = parse_expense_date(new_value)
+            if new_value is None:
+                return DATE_FORMAT_ERROR
 
         # Update the specified field and the updated_at timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = datetime.now().strftime(DATETIME_FORMAT)
         try:
-            cursor.execute(f"UPDATE expenses SET {field} = ?, updated_at = ? WHERE expense_id = ?", (new_value, timestamp, expense_id))
-            self.db.commit()
-            return "Expense updated successfully."
-        except sqlite3.OperationalError as e:
+            cursor.execute(update_sql, (new_value, timestamp, expense_id, user_id, is_admin))
+        except (sqlite3.OperationalError, sqlite3.IntegrityError) as e:
             return f"Failed to update expense: {e}"
+
+        if cursor.rowcount == 0:
+            if cursor.execute(EXPENSE_EXISTS_SQL, (expense_id,)).fetchone() is None:
+                return f"Error: Expense '{expense_id}' does not exist."
+            return "Error: You can only update your own expenses."
+
+        return "Expense updated successfully."
     
     def delete_expense(self, expense_id: int) -> str:
         current_user = self.auth.get_current_user()
@@ -160,20 +400,22 @@ class ExpenseManager:
             return "Error: No user is currently logged in."
     
         user_id = current_user["user_id"]
-        cursor = self.db.cursor()
-    
-        # Check if the expense belongs to the logged-in user
-        cursor.execute("SELECT user_id FROM expenses WHERE expense_id = ? AND is_deleted = 0", (expense_id,))
-        expense_owner = cursor.fetchone()
-        if not expense_owner or expense_owner[0] != user_id or not self.auth.is_admin():
-            return "Error: You can only delete your own expenses."
+        is_admin = bool(current_user.get("is_admin"))
+        cursor = self.cursor
     
+        # Stamp updated_at so the next reporting sync picks up the deletion
+        timestamp = datetime.now().strftime(DATETIME_FORMAT)
         try:
-            cursor.execute("UPDATE expenses SET is_deleted = 1 WHERE expense_id = ?", (expense_id,))
-            self.db.commit()
-            return "Expense deleted successfully."
-        except sqlite3.OperationalError as e:
+            cursor.execute(DELETE_EXPENSE_SQL, (timestamp, expense_id, user_id, is_admin))
+        except (sqlite3.OperationalError, sqlite3.IntegrityError) as e:
             return f"Failed to delete expense: {e}"
+    
+        if cursor.rowcount == 0:
+            if cursor.execute(EXPENSE_EXISTS_SQL, (expense_id,)).fetchone() is None:
+                return f"Error: Expense '{expense_id}' does not exist."
+            return "Error: You can only delete your own expenses."
+    
+        return "Expense deleted successfully."
 
     def list_expenses(self, filters: Optional[Dict[str, Union[str, List[float]]]] = None, format_as_table: bool = True) -> Union[str, List[Dict[str, Union[int, float, str]]]]:
         current_user = self.auth.get_current_user()
@@ -182,77 +424,54 @@ class ExpenseManager:
     
         user_id = current_user["user_id"]
         is_admin = current_user.get("is_admin", False)
-        cursor = self.db.cursor()
-    
-        # Base query
-        query = """
-            SELECT 
-                e.expense_id, e.amount, e.description, e.tag, e.expense_date,
-                c.category_name, p.name as payment_method,
-                u.username
-            FROM expenses e
-            JOIN categories c ON e.category_id = c.category_id
-            JOIN payment_methods p ON e.payment_method_id = p.payment_method_id
-            JOIN users u ON e.user_id = u.user_id
-            WHERE e.is_deleted = 0
-        """
         params = []
     
         # Restrict to user's expenses if not admin
         if not is_admin:
-            query += " AND e.user_id = ?"
             params.append(user_id)
     
-        # Apply filters
+        # Resolve category and payment method names to ids up front so the filters
+        # compare integer columns on expenses directly
         if filters:
+            filters = dict(filters)
             if "category" in filters:
-                query += " AND c.category_name = ?"
-                params.append(filters["category"])
-            if "date" in filters:
-                query += " AND e.expense_date = ?"
-                params.append(filters["date"])
-            if "amount_range" in filters:
-                query += " AND e.amount BETWEEN ? AND ?"
-                params.extend(filters["amount_range"])
+                category_id = self.get_category_id(filters["category"])
+                if category_id is None:
+                    return f"Error: Category '{filters['category']}' does not exist."
+                filters["category"] = category_id
             if "payment_method" in filters:
-                query += " AND p.name = ?"
-                params.append(filters["payment_method"])
+                payment_method_id = self.get_payment_method_id(filters["payment_method"])
+                if payment_method_id is None:
+                    return f"Error: Payment method '{filters['payment_method']}' does not exist."
+                filters["payment_method"] = payment_method_id
+    
+        # Apply filters
+        mask = 0
+        if filters:
+            for bit, key in enumerate(LIST_EXPENSES_FILTERS):
+                if key not in filters:
+                    continue
+                mask |= 1 << bit
+                if key == "amount_range":
+                    params.extend(filters[key])
+                else:
+                    params.append(filters[key])
+        query = LIST_EXPENSES_QUERIES[not is_admin, mask]
     
-        cursor.execute(query, params)
-        expenses = cursor.fetchall()
-        
-        expense_list = [
-            {
-                "expense_id": expense[0], 
-                "amount": expense[1], 
-                "description": expense[2], 
-                "tag": expense[3], 
-                "date": expense[4],
-                "category": expense[5],
-                "payment_method": expense[6],
-                "username": expense[7]
-            }
-            for expense in expenses
-        ]
-        
         if not format_as_table:
-            return expense_list
+            # The select list is aliased to the result keys, so rows convert straight to dicts
+            cursor = self.db.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(query, params)
+            return [dict(expense) for expense in cursor]
             
-        # Format as table
+        # Format as table, streaming rows from the cursor into the renderer
+        cursor = self.cursor.execute(query, params)
         headers = ['ID', 'Date', 'Amount', 'Category', 'Description', 'Tag', 'Payment Method', 'Username']
-        formatted_data = [
-            (
-                e["expense_id"], 
-                e["date"], 
-                e["amount"],
-                e["category"], 
-                e["description"] or "-", 
-                e["tag"] or "-", 
-                e["payment_method"],
-                e["username"]
-            ) 
-            for e in expense_list
-        ]
+        formatted_data = (
+            (expense_id, date, amount, category, description or "-", tag or "-", payment_method, username)
+            for expense_id, amount, description, tag, date, category, payment_method, username in cursor
+        )
         
         return self._format_tabular_report(
             "Expense List", 
@@ -270,48 +489,35 @@ class ExpenseManager:
     
         user_id = current_user["user_id"]
         is_admin = current_user.get("is_admin", False)
+
+        if table_name not in EXPORT_TABLES:
+            return f"Error: Table '{table_name}' cannot be exported. Choose one of: {', '.join(sorted(EXPORT_TABLES))}."
+
+        # csv.writer only takes a single character; check before the target file is truncated
+        if len(delimiter) != 1:
+            return "Error: The delimiter must be a single character."
     
-        cursor = self.db.cursor()
+        cursor = self.cursor
     
         # Restrict normal users to export only their own data
         if not is_admin:
             if table_name != "expenses":
                 return "Error: Normal users can only export their own expenses."
-            query = """
-                SELECT e.expense_id, u.user_id, c.category_name, p.name as payment_method_name, 
-                       e.amount, e.expense_date, e.description, e.tag
-                FROM expenses e
-                JOIN categories c ON e.category_id = c.category_id
-                JOIN payment_methods p ON e.payment_method_id = p.payment_method_id
-                JOIN users u ON e.user_id = u.user_id
-                WHERE e.user_id = ? AND e.is_deleted = 0
-            """
-            cursor.execute(query, (user_id,))
-        else:
+            cursor.execute(EXPORT_EXPENSES_SQL + " AND e.user_id = ?", (user_id,))
+        elif table_name == "expenses":
             # Admins can export all data
-            query = """
-                SELECT e.expense_id, u.user_id, c.category_name, p.name as payment_method_name, 
-                       e.amount, e.expense_date, e.description, e.tag
-                FROM expenses e
-                JOIN categories c ON e.category_id = c.category_id
-                JOIN payment_methods p ON e.payment_method_id = p.payment_method_id
-                JOIN users u ON e.user_id = u.user_id
-                WHERE e.is_deleted = 0
-            """
-            cursor.execute(query)
-    
-        rows = cursor.fetchall()
+            cursor.execute(EXPORT_EXPENSES_SQL)
+        else:
+            cursor.execute(EXPORT_TABLE_SQL[table_name])
     
         # Fetch column headers
         headers = [description[0] for description in cursor.description]
     
-        # Write data to the specified file
-        with open(file_path, "w") as file:
-            # Write headers
-            file.write(delimiter.join(headers) + "\n")
-            # Write rows
-            for row in rows:
-                file.write(delimiter.join(map(str, row)) + "\n")
+        # Stream rows from the cursor straight into the file instead of loading the table
+        with open(file_path, "w", newline="", buffering=EXPORT_BUFFER_SIZE) as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            writer.writerow(headers)
+            writer.writerows(cursor)
     
         return f"Data exported to {file_path}."
 
@@ -322,51 +528,36 @@ class ExpenseManager:
         Args:
             title: Report title string
             headers: List of column header strings
-            data: List of data rows (tuples or lists)
+            data: Iterable of data rows (tuples or lists), consumed once
             formatters: Optional dict mapping column names to formatting functions
             
         Returns:
             Formatted report string
         """
-        # Default column widths
-        col_widths = {header: len(header) + 2 for header in headers}
-        
-        # Determine column widths based on data
-        for row in data:
-            for i, value in enumerate(row):
-                header = headers[i]
-                # Format the value if a formatter exists
-                if formatters and header in formatters:
-                    formatted = formatters[header](value)
-                else:
-                    formatted = str(value)
-                col_widths[header] = max(col_widths[header], len(formatted) + 2)
-        
-        # Create the report
-        report = f"{title}\n"
-        report += "=" * len(title) + "\n\n"
-        
-        # Header row
-        header_row = ""
-        for header in headers:
-            header_row += header.ljust(col_widths[header])
-        report += header_row + "\n"
+        # Format every cell once, then size the columns from the formatted text
+        formatters = formatters or {}
+        column_formatters = [formatters.get(header, str) for header in headers]
+        formatted_rows = [
+            [format_value(value) for format_value, value in zip(column_formatters, row)]
+            for row in data
+        ]
+        columns = zip(*formatted_rows) if formatted_rows else [()] * len(headers)
+        col_widths = [
+            max(len(header), max(map(len, column), default=0)) + 2
+            for header, column in zip(headers, columns)
+        ]
         
-        # Separator line
-        separator = "-" * sum(col_widths.values()) + "\n"
-        report += separator
+        # One left-aligned field per column, built once and applied to every row
+        row_format = "".join(f"{{:<{width}}}" for width in col_widths)
         
-        # Data rows
-        for row in data:
-            data_row = ""
-            for i, value in enumerate(row):
-                header = headers[i]
-                # Format the value if a formatter exists
-                if formatters and header in formatters:
-                    formatted = formatters[header](value)
-                else:
-                    formatted = str(value)
-                data_row += formatted.ljust(col_widths[header])
-            report += data_row + "\n"
+        # Title, header row and separator line, followed by the data rows
+        lines = [
+            title,
+            "=" * len(title),
+            "",
+            row_format.format(*headers),
+            "-" * sum(col_widths),
+        ]
+        lines.extend(row_format.format(*row) for row in formatted_rows)
         
-        return report
+        return "\n".join(lines) + "\n"
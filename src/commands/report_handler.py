@@ -1,5 +1,74 @@
+import re
 import sqlite3
 import time
+from functools import lru_cache
+from itertools import chain
+
+# YYYY-MM-DD with the month limited to 01-12 and the day to 01-31
+DATE_PATTERN = re.compile(r"\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])")
+
+# Month names for the monthly reports, indexed by month number - 1 (avoids a datetime dependency)
+MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+)
+
+# Date ranges are parsed by pure functions so repeated reports over the same
+# range reuse the cached result
+
+@lru_cache(maxsize=128)
+def is_valid_date_format(date_str):
+    """
+    Validate a date string in YYYY-MM-DD format.
+
+    Args:
+        date_str: Date string to validate
+
+    Returns:
+        Boolean indicating if the format is valid
+    """
+    return DATE_PATTERN.fullmatch(date_str) is not None
+
+@lru_cache(maxsize=128)
+def parse_date_range(date_range: str):
+    """
+    Parse a date range string into start and end date components.
+
+    Args:
+        date_range: String in format 'YYYY/MM/DD - YYYY/MM/DD' or 'YYYY - YYYY'
+
+    Returns:
+        Tuple of (start_date, end_date)
+
+    Raises:
+        ValueError: If the range or either date is malformed
+    """
+    # Split the date range string; anything after a second separator ends up in
+    # the end date and fails validation
+    if " to " in date_range:
+        start_date, end_date = date_range.split(" to ", 1)
+    elif " - " in date_range:
+        start_date, end_date = date_range.split(" - ", 1)
+    else:
+        raise ValueError("Invalid date range format. Use 'YYYY/MM/DD - YYYY/MM/DD' or 'YYYY - YYYY'")
+
+    start_date = start_date.strip()
+    end_date = end_date.strip()
+
+    # Handle year-only format (YYYY - YYYY)
+    if len(start_date) == 4 and start_date.isdigit() and len(end_date) == 4 and end_date.isdigit():
+        start_date = f"{start_date}/01/01"  # Jan 1st of start year
+        end_date = f"{end_date}/12/31"      # Dec 31st of end year
+
+    # Convert date format from YYYY/MM/DD to YYYY-MM-DD for SQLite
+    start_date = start_date.replace('/', '-')
+    end_date = end_date.replace('/', '-')
+
+    # Validate date format
+    if not (is_valid_date_format(start_date) and is_valid_date_format(end_date)):
+        raise ValueError("Invalid date format. Use YYYY/MM/DD - YYYY/MM/DD or YYYY - YYYY")
+
+    return (start_date, end_date)
 
 class ReportHandler:
     """
@@ -10,6 +79,8 @@ class ReportHandler:
     def __init__(self, db_connection):
         """Initialize with a database connection"""
         self.db = db_connection
+        # Each report consumes its rows before the next query runs, so a single cursor serves them all
+        self.cursor = db_connection.cursor()
 
     def report(self, report_type, args):
         """
@@ -53,13 +124,11 @@ class ReportHandler:
         try:
             # Parse the provided date range
             parsed_dates = self.parse_date_range(date_range)
-            if isinstance(parsed_dates, str):  # Error message returned
-                return parsed_dates
                 
             start_date, end_date = parsed_dates
             
             # Execute query with parameters
-            results = self._execute_query(
+            results = self._iter_query(
                 """
                 SELECT expense_id, expense_date, amount, description, 
                        category_name, username, payment_method_name
@@ -76,7 +145,7 @@ class ReportHandler:
             
             # Format the results
             headers = ['ID', 'Date', 'Amount', 'Category', 'Description', "Username", "Payment Method"]
-            data = [(row[0], row[1], row[2], row[4], row[3], row[5], row[6]) for row in results]
+            data = ((row[0], row[1], row[2], row[4], row[3], row[5], row[6]) for row in results)
             
             return self._format_tabular_report(
                 f"Top {n} Expenses from {start_date} to {end_date}", 
@@ -102,8 +171,6 @@ class ReportHandler:
         try:
             # Get date range (default or specified)
             date_range_tuple = self._get_date_range(date_range)
-            if isinstance(date_range_tuple, str):  # Error message returned
-                return date_range_tuple
                 
             start_date, end_date = date_range_tuple
             
@@ -122,12 +189,16 @@ class ReportHandler:
                 return f"No spending found for category '{category_name}' in the specified date range."
             
             # Create simple report
-            report = f"Spending for Category: '{category_name}'\n"
-            report += "=" * len(report) + "\n\n"
-            report += f"Total amount spent: ${results[0][0]:.2f}\n"
-            report += f"Time period: {start_date} to {end_date}\n"
+            title = f"Spending for Category: '{category_name}'"
+            lines = [
+                title,
+                "=" * (len(title) + 1),
+                "",
+                f"Total amount spent: ${results[0][0]:.2f}",
+                f"Time period: {start_date} to {end_date}",
+            ]
             
-            return report
+            return "\n".join(lines) + "\n"
             
         except Exception as e:
             return self._format_error("generating category spending report", e)
@@ -145,23 +216,22 @@ class ReportHandler:
         try:
             # Get date range (default or specified)
             date_range_tuple = self._get_date_range(date_range)
-            if isinstance(date_range_tuple, str):  # Error message returned
-                return date_range_tuple
                 
             start_date, end_date = date_range_tuple
             
             # Execute query with parameters - find expenses above category average
-            results = self._execute_query(
+            results = self._iter_query(
                 """
-                SELECT e.expense_id, e.expense_date, e.amount, e.description, e.tag, e.payment_method_name, e.username, e.category_name, av.average
-                FROM denormalized_expenses e
-                INNER JOIN (
-                    SELECT category_name, AVG(amount) as average 
+                WITH e AS (
+                    SELECT expense_id, expense_date, amount, description, tag, payment_method_name, username, category_name,
+                           AVG(amount) OVER (PARTITION BY category_name) AS average
                     FROM denormalized_expenses
-                    GROUP BY category_name
-                ) av ON e.category_name = av.category_name
-                WHERE e.amount > av.average AND e.expense_date BETWEEN ? AND ?
-                ORDER BY (e.amount / av.average) DESC;
+                )
+                SELECT expense_id, expense_date, amount, description, tag, payment_method_name, username, category_name, average,
+                       (amount - average) / average * 100 AS percent_above
+                FROM e
+                WHERE amount > average AND expense_date BETWEEN ? AND ?
+                ORDER BY (amount / average) DESC;
                 """,
                 (start_date, end_date)
             )
@@ -169,15 +239,14 @@ class ReportHandler:
             if not results:
                 return "No expenses above their category average found in the specified date range."
             
-            # Calculate percentage above average for each result
-            formatted_data = []
-            for row in results:
-                expense_id, date, amount, description, tag, payment_method, username, category, category_avg = row
-                percent_above = ((amount - category_avg) / category_avg) * 100
-                formatted_data.append((
+            # Percentages above average come computed from the query
+            formatted_data = (
+                (
                     expense_id, date, amount, category, description, tag, payment_method, username,
                     category_avg, f"{percent_above:.1f}%"
-                ))
+                )
+                for expense_id, date, amount, description, tag, payment_method, username, category, category_avg, percent_above in results
+            )
             
             headers = ['ID', 'Date', 'Amount', 'Category', 'Description', 'Tag', 'Payment Method', 'Username', 'Category Avg', '% Above']
             
@@ -254,26 +323,32 @@ class ReportHandler:
             start_date = f"{year}-01-01"
             end_date = f"{year}-12-31"
             
-            # Get spending by user per month
-            monthly_spending = self._execute_query(
+            # Get the highest spender of each month, ranked by SQLite
+            monthly_top_spenders = self._execute_query(
                 """
-                SELECT 
-                    strftime('%m', expense_date) as month_num,
-                    username,
-                    SUM(amount) as total_spent
-                FROM denormalized_expenses
-                WHERE expense_date BETWEEN ? AND ?
-                GROUP BY month_num, username
-                ORDER BY month_num, total_spent DESC
+                SELECT month_num, username, total_spent
+                FROM (
+                    SELECT 
+                        strftime('%m', expense_date) as month_num,
+                        username,
+                        SUM(amount) as total_spent,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY strftime('%m', expense_date)
+                            ORDER BY SUM(amount) DESC
+                        ) as spender_rank
+                    FROM denormalized_expenses
+                    WHERE expense_date BETWEEN ? AND ?
+                    GROUP BY month_num, username
+                )
+                WHERE spender_rank = 1
                 """,
                 (start_date, end_date)
             )
             
-            if not monthly_spending:
+            if not monthly_top_spenders:
                 return f"No spending data found for year {year}."
             
-            # Find highest spender for each month
-            highest_spenders = self._get_highest_spenders_by_month(monthly_spending)
+            highest_spenders = {month: (username, amount) for month, username, amount in monthly_top_spenders}
             
             # Format the results
             return self._format_highest_spenders_report(highest_spenders, year)
@@ -294,13 +369,11 @@ class ReportHandler:
         try:
             # Get date range (default or specified)
             date_range_tuple = self._get_date_range(date_range)
-            if isinstance(date_range_tuple, str):  # Error message returned
-                return date_range_tuple
                 
             start_date, end_date = date_range_tuple
             
             # Get category usage statistics
-            results = self._execute_query(
+            results = self._iter_query(
                 """
                 SELECT 
                     category_name,
@@ -347,8 +420,6 @@ class ReportHandler:
         try:
             # Get date range (default or specified)
             date_range_tuple = self._get_date_range(date_range)
-            if isinstance(date_range_tuple, str):  # Error message returned
-                return date_range_tuple
                 
             start_date, end_date = date_range_tuple
             
@@ -370,12 +441,8 @@ class ReportHandler:
             if not payment_methods:
                 return "No payment method usage data found in the specified date range."
             
-            # Get total spending for percentage calculation
-            total_spending_result = self._execute_query(
-                "SELECT SUM(amount) FROM denormalized_expenses WHERE expense_date BETWEEN ? AND ?",
-                (start_date, end_date)
-            )
-            total_spent = total_spending_result[0][0] if total_spending_result and total_spending_result[0][0] else 0
+            # The per-method totals add up to the total spending for percentage calculation
+            total_spent = sum(amount for _, _, amount in payment_methods)
             
             # Calculate percentages
             formatted_data = []
@@ -411,13 +478,11 @@ class ReportHandler:
         try:
             # Get date range (default or specified)
             date_range_tuple = self._get_date_range(date_range)
-            if isinstance(date_range_tuple, str):  # Error message returned
-                return date_range_tuple
                 
             start_date, end_date = date_range_tuple
             
             # Get tag statistics
-            results = self._execute_query(
+            results = self._iter_query(
                 """
                 SELECT 
                     tag,
@@ -464,9 +529,27 @@ class ReportHandler:
         Returns:
             List of result rows
         """
-        cursor = self.db.cursor()
-        cursor.execute(query, parameters)
-        return cursor.fetchall()
+        return self.cursor.execute(query, parameters).fetchall()
+    
+    def _iter_query(self, query, parameters=()):
+        """
+        Execute a parameterized SQL query and stream its rows.
+        
+        The rows come straight from the shared cursor, so they must be consumed
+        before the next query runs.
+        
+        Args:
+            query: SQL query string with ? placeholders
+            parameters: Tuple of parameter values
+            
+        Returns:
+            Iterator over the result rows, or None if the query returned no rows
+        """
+        cursor = self.cursor.execute(query, parameters)
+        first_row = cursor.fetchone()
+        if first_row is None:
+            return None
+        return chain((first_row,), cursor)
     
     def _get_date_range(self, date_range=None):
         """
@@ -477,7 +560,10 @@ class ReportHandler:
             date_range: Optional date range string
             
         Returns:
-            Tuple of (start_date, end_date) or error message string
+            Tuple of (start_date, end_date)
+            
+        Raises:
+            ValueError: If the date range string is malformed
         """
         if date_range:
             return self.parse_date_range(date_range)
@@ -491,54 +577,39 @@ class ReportHandler:
         Args:
             title: Report title string
             headers: List of column header strings
-            data: List of data rows (tuples or lists)
+            data: Iterable of data rows (tuples or lists), consumed once
             formatters: Optional dict mapping column names to formatting functions
             
         Returns:
             Formatted report string
         """
-        # Default column widths
-        col_widths = {header: len(header) + 2 for header in headers}
-        
-        # Determine column widths based on data
-        for row in data:
-            for i, value in enumerate(row):
-                header = headers[i]
-                # Format the value if a formatter exists
-                if formatters and header in formatters:
-                    formatted = formatters[header](value)
-                else:
-                    formatted = str(value)
-                col_widths[header] = max(col_widths[header], len(formatted) + 2)
+        # Format every cell once, then size the columns from the formatted text
+        formatters = formatters or {}
+        column_formatters = [formatters.get(header, str) for header in headers]
+        formatted_rows = [
+            [format_value(value) for format_value, value in zip(column_formatters, row)]
+            for row in data
+        ]
+        columns = zip(*formatted_rows) if formatted_rows else [()] * len(headers)
+        col_widths = [
+            max(len(header), max(map(len, column), default=0)) + 2
+            for header, column in zip(headers, columns)
+        ]
         
-        # Create the report
-        report = f"{title}\n"
-        report += "=" * len(title) + "\n\n"
+        # One left-aligned field per column, built once and applied to every row
+        row_format = "".join(f"{{:<{width}}}" for width in col_widths)
         
-        # Header row
-        header_row = ""
-        for header in headers:
-            header_row += header.ljust(col_widths[header])
-        report += header_row + "\n"
-        
-        # Separator line
-        separator = "-" * sum(col_widths.values()) + "\n"
-        report += separator
+        # Title, header row and separator line, followed by the data rows
+        lines = [
+            title,
+            "=" * len(title),
+            "",
+            row_format.format(*headers),
+            "-" * sum(col_widths),
+        ]
+        lines.extend(row_format.format(*row) for row in formatted_rows)
         
-        # Data rows
-        for row in data:
-            data_row = ""
-            for i, value in enumerate(row):
-                header = headers[i]
-                # Format the value if a formatter exists
-                if formatters and header in formatters:
-                    formatted = formatters[header](value)
-                else:
-                    formatted = str(value)
-                data_row += formatted.ljust(col_widths[header])
-            report += data_row + "\n"
-        
-        return report
+        return "\n".join(lines) + "\n"
     
     def _format_monthly_category_report(self, results, year):
         """
@@ -555,68 +626,34 @@ class ReportHandler:
         months = sorted(set(row[0] for row in results))
         categories = sorted(set(row[1] for row in results))
         
-        # Create a data structure for easy lookup
-        spending_data = {}
-        for row in results:
-            month, category, amount = row
-            if month not in spending_data:
-                spending_data[month] = {}
-            spending_data[month][category] = amount
+        # Dense month x category matrix filled in one pass over the results
+        month_index = {month: i for i, month in enumerate(months)}
+        category_index = {category: i for i, category in enumerate(categories)}
+        spending = [[0] * len(categories) for _ in months]
+        for month, category, amount in results:
+            spending[month_index[month]][category_index[category]] = amount
         
         # Create the report
-        report = f"Monthly Category Spending for {year}\n"
-        report += "=" * len(report) + "\n\n"
+        title = f"Monthly Category Spending for {year}"
         
         # Header row with category names
         header = "Month".ljust(12)
-        for category in categories:
-            header += category.ljust(15)
+        header += "".join(category.ljust(15) for category in categories)
         header += "Total".ljust(15)
-        report += header + "\n"
         
-        # Separator line
-        report += "-" * len(header) + "\n"
-        
-        # Month names - avoiding datetime dependency
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
+        # Title, header row and separator line, followed by the data rows
+        lines = [title, "=" * (len(title) + 1), "", header, "-" * len(header)]
         
         # Data rows
-        for month in months:
-            month_name = month_names[int(month)-1]
+        for month, amounts in zip(months, spending):
+            month_name = MONTH_NAMES[int(month)-1]
             row_str = month_name.ljust(12)
-            month_total = 0
-            
-            for category in categories:
-                amount = spending_data.get(month, {}).get(category, 0)
-                month_total += amount
-                row_str += f"${amount:<14.2f}"
-            
-            row_str += f"${month_total:<14.2f}"
-            report += row_str + "\n"
+            row_str += "".join(f"${amount:<14.2f}" for amount in amounts)
+            row_str += f"${sum(amounts):<14.2f}"
+            lines.append(row_str)
         
-        return report
+        return "\n".join(lines) + "\n"
     
-    def _get_highest_spenders_by_month(self, monthly_spending):
-        """
-        Determine the highest spender for each month from spending data.
-        
-        Args:
-            monthly_spending: List of (month, username, amount) tuples
-            
-        Returns:
-            Dictionary mapping month numbers to (username, amount) tuples
-        """
-        highest_spenders = {}
-        
-        for month, username, amount in monthly_spending:
-            if month not in highest_spenders or amount > highest_spenders[month][1]:
-                highest_spenders[month] = (username, amount)
-                
-        return highest_spenders
-        
     def _format_highest_spenders_report(self, highest_spenders, year):
         """
         Format highest spender data into a report.
@@ -628,15 +665,8 @@ class ReportHandler:
         Returns:
             Formatted report string
         """
-        # Month names - avoiding datetime dependency
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        
         # Format the results
-        report = f"Highest Spender Per Month for {year}\n"
-        report += "=" * len(report) + "\n\n"
+        title = f"Highest Spender Per Month for {year}"
         
         # Column headers
         headers = ['Month', 'User', 'Amount Spent']
@@ -645,7 +675,7 @@ class ReportHandler:
         data = []
         for month_num in sorted(highest_spenders.keys()):
             username, amount = highest_spenders[month_num]
-            month_name = month_names[int(month_num)-1]
+            month_name = MONTH_NAMES[int(month_num)-1]
             data.append((month_name, username, amount))
         
         # Create tabular formatting
@@ -657,14 +687,13 @@ class ReportHandler:
         
         # Header row
         header_row = "Month".ljust(col_widths['Month']) + "User".ljust(col_widths['User']) + "Amount Spent".ljust(col_widths['Amount Spent'])
-        report += header_row + "\n"
-        report += "-" * sum(col_widths.values()) + "\n"
+        lines = [title, "=" * (len(title) + 1), "", header_row, "-" * sum(col_widths.values())]
         
         # Data rows
         for month_name, username, amount in data:
-            report += month_name.ljust(col_widths['Month']) + username.ljust(col_widths['User']) + f"${amount:.2f}".ljust(col_widths['Amount Spent']) + "\n"
+            lines.append(month_name.ljust(col_widths['Month']) + username.ljust(col_widths['User']) + f"${amount:.2f}".ljust(col_widths['Amount Spent']))
         
-        return report
+        return "\n".join(lines) + "\n"
     
     def _format_error(self, action, exception):
         """
@@ -680,59 +709,10 @@ class ReportHandler:
         return f"Error {action}: {str(exception)}"
 
     def _is_valid_date_format(self, date_str):
-        """
-        Validate a date string in YYYY-MM-DD format.
-        
-        Args:
-            date_str: Date string to validate
-            
-        Returns:
-            Boolean indicating if the format is valid
-        """
-        try:
-            year, month, day = date_str.split('-')
-            return (len(year) == 4 and len(month) == 2 and len(day) == 2 and
-                   1 <= int(month) <= 12 and 1 <= int(day) <= 31)
-        except:
-            return False
+        """Validate a date string in YYYY-MM-DD format (see is_valid_date_format)."""
+        return is_valid_date_format(date_str)
 
     def parse_date_range(self, date_range: str):
-        """
-        Parse a date range string into start and end date components.
-        
-        Args:
-            date_range: String in format 'YYYY/MM/DD - YYYY/MM/DD' or 'YYYY - YYYY'
-            
-        Returns:
-            Tuple of (start_date, end_date) or error message string
-        """
-        try:
-            # Split the date range string
-            if " to " in date_range:
-                start_date, end_date = date_range.split(" to ")
-            elif " - " in date_range:
-                start_date, end_date = date_range.split(" - ")
-            else:
-                return "Invalid date range format. Use 'YYYY/MM/DD - YYYY/MM/DD' or 'YYYY - YYYY'"
-            
-            start_date = start_date.strip()
-            end_date = end_date.strip()
-            
-            # Handle year-only format (YYYY - YYYY)
-            if len(start_date) == 4 and start_date.isdigit() and len(end_date) == 4 and end_date.isdigit():
-                start_date = f"{start_date}/01/01"  # Jan 1st of start year
-                end_date = f"{end_date}/12/31"      # Dec 31st of end year
-            
-            # Convert date format from YYYY/MM/DD to YYYY-MM-DD for SQLite
-            start_date = start_date.replace('/', '-')
-            end_date = end_date.replace('/', '-')
-            
-            # Validate date format
-            if not (self._is_valid_date_format(start_date) and self._is_valid_date_format(end_date)):
-                return "Invalid date format. Use YYYY/MM/DD - YYYY/MM/DD or YYYY - YYYY"
-                
-            return (start_date, end_date)
-            
-        except Exception as e:
-            return f"Error parsing date range: {str(e)}"
+        """Parse a date range string into start and end dates (see parse_date_range)."""
+        return parse_date_range(date_range)
 
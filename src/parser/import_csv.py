@@ -3,6 +3,13 @@ import csv
 import sqlite3
 from datetime import datetime
 from src.auth.auth_integration import ExpenseAuthIntegration
+from database.init_db import open_db
+
+# Constant statement text so every row is bound to the same prepared statement
+INSERT_EXPENSE_SQL = """
+INSERT INTO expenses (user_id, category_id, payment_method_id, amount, tag, description, expense_date)
+VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+"""
 
 class ExpenseCSVImporter:
     def __init__(self, auth: ExpenseAuthIntegration, current_user_id=None):
@@ -105,14 +112,29 @@ class ExpenseCSVImporter:
             return False
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            # open_db keeps a larger prepared statement cache and runs in autocommit
+            # mode, so the whole import is wrapped in one explicit transaction
+            conn = open_db(self.db_path)
             cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            
+            # Load the name to id lookups once instead of querying them for every row
+            category_ids = dict(cursor.execute(
+                "SELECT category_name, category_id FROM categories WHERE is_deleted = 0"
+            ))
+            payment_method_ids = dict(cursor.execute(
+                "SELECT name, payment_method_id FROM payment_methods WHERE is_deleted = 0"
+            ))
+            
+            # Check if the current user is an admin
+            is_admin = self.auth.is_admin()
             
             with open(csv_file, 'r', newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
                 
-                # Read and insert data
-                rows_inserted = 0
+                # Read the rows, then insert them all at once; each row keeps its
+                # number for error reporting
+                expenses = []
                 rows_failed = 0
                 
                 for row in reader:
@@ -121,12 +143,15 @@ class ExpenseCSVImporter:
                         if not any(row.values()):
                             continue
                         
-                        # Check if the current user is an admin
-                        is_admin = self.auth.is_admin()
-                        
                         # Get or create category and payment method
-                        category_id = self.get_category_id(conn, row['category_name'])
-                        payment_method_id = self.get_payment_method_id(conn, row['payment_method_name'])
+                        category_id = category_ids.get(row['category_name'])
+                        if category_id is None:
+                            category_id = self.get_category_id(conn, row['category_name'])
+                            category_ids[row['category_name']] = category_id
+                        payment_method_id = payment_method_ids.get(row['payment_method_name'])
+                        if payment_method_id is None:
+                            payment_method_id = self.get_payment_method_id(conn, row['payment_method_name'])
+                            payment_method_ids[row['payment_method_name']] = payment_method_id
                         
                         # Determine the user_id for the expense
                         if is_admin:
@@ -134,48 +159,58 @@ class ExpenseCSVImporter:
                             if 'user_id' in row and row['user_id']:
                                 user_id = int(row['user_id'])
                             else:
-                                print(f"Warning: Missing 'user_id' in row {rows_inserted + rows_failed + 1}. Skipping.")
+                                print(f"Warning: Missing 'user_id' in row {len(expenses) + rows_failed + 1}. Skipping.")
                                 rows_failed += 1
                                 continue
                         else:
                             # Normal users can only import their own expenses
                             user_id = self.current_user_id
                         
-                        # Prepare values for insertion
-                        expense_data = {
-                            'user_id': user_id,
-                            'category_id': category_id,
-                            'payment_method_id': payment_method_id,
-                            'amount': float(row['amount']),
-                            'tag': row['tag'],
-                            'description': row.get('description', '')
-                        }
-                        
-                        # Handle expense_date if provided
-                        if 'expense_date' in row and row['expense_date']:
-                            expense_data['expense_date'] = row['expense_date']
+                        # Prepare values for insertion; a blank expense_date falls back to
+                        # the current time in SQL so the statement text never changes
+                        expense_data = (
+                            user_id,
+                            category_id,
+                            payment_method_id,
+                            float(row['amount']),
+                            row['tag'],
+                            row.get('description', ''),
+                            row.get('expense_date') or None
+                        )
                         
-                        # Prepare SQL statement
-                        columns = ', '.join(expense_data.keys())
-                        placeholders = ', '.join(['?'] * len(expense_data))
-                        sql = f"INSERT INTO expenses ({columns}) VALUES ({placeholders})"
-                        
-                        cursor.execute(sql, list(expense_data.values()))
-                        rows_inserted += 1
+                        expenses.append((len(expenses) + rows_failed + 1, expense_data))
                         
                     except ValueError as e:
-                        print(f"Error in row {rows_inserted + rows_failed + 1}: {str(e)}")
+                        print(f"Error in row {len(expenses) + rows_failed + 1}: {str(e)}")
                         rows_failed += 1
                     except sqlite3.Error as e:
-                        print(f"Database error in row {rows_inserted + rows_failed + 1}: {str(e)}")
+                        print(f"Database error in row {len(expenses) + rows_failed + 1}: {str(e)}")
                         rows_failed += 1
                     except PermissionError as e:
-                        print(f"Permission error in row {rows_inserted + rows_failed + 1}: {str(e)}")
+                        print(f"Permission error in row {len(expenses) + rows_failed + 1}: {str(e)}")
                         rows_failed += 1
                     except Exception as e:
-                        print(f"Error processing row {rows_inserted + rows_failed + 1}: {str(e)}")
+                        print(f"Error processing row {len(expenses) + rows_failed + 1}: {str(e)}")
                         rows_failed += 1
             
+            # Insert the batch under a savepoint. If any row fails, undo the partial
+            # batch and insert the rows one at a time so the good rows are kept and
+            # each bad row is reported
+            cursor.execute("SAVEPOINT import_batch")
+            try:
+                cursor.executemany(INSERT_EXPENSE_SQL, (expense_data for _, expense_data in expenses))
+                rows_inserted = len(expenses)
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK TO import_batch")
+                rows_inserted = 0
+                for row_number, expense_data in expenses:
+                    try:
+                        cursor.execute(INSERT_EXPENSE_SQL, expense_data)
+                        rows_inserted += 1
+                    except sqlite3.Error as e:
+                        print(f"Database error in row {row_number}: {str(e)}")
+                        rows_failed += 1
+            cursor.execute("RELEASE import_batch")
             conn.commit()
             print(f"Successfully imported {rows_inserted} expenses")
             if rows_failed > 0: